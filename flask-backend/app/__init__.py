@@ -3,38 +3,63 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_cors import CORS
-from flask_session import Session
 from flask_bcrypt import Bcrypt
 import os
 import redis
+from sqlalchemy.exc import SQLAlchemyError
 from datetime import timedelta
-from flask import send_from_directory
+from flask import jsonify
+from app.utils.cache import CatalogCache
+from app.utils.asset_store import AssetStore
+from app.utils.json_provider import JSONProvider
+from app.utils.password_hasher import PasswordHasher, PasswordHasherBusy
+from app.utils.identity import IdentityCache
+from app.utils.trending import TrendingTracker
+from app.utils.session_store import SessionStore, redis_client
+from app.utils.db_pool import pool_metrics
+from app.utils.db_routing import ReplicaRouter, RoutingSession
+from app.utils.file_delivery import send_upload, DELIVERY_MODES
+from app.utils.text_search import SEARCH_BACKENDS
+from app.utils.security import admin_required
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+replica_router = ReplicaRouter()
 migrate = Migrate()
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 cors = CORS()
-sess = Session()
+session_store = SessionStore()
+catalog_cache = CatalogCache()
+asset_store = AssetStore()
+password_hasher = PasswordHasher()
+identity_cache = IdentityCache()
+trending = TrendingTracker()
 
 def create_app(config_name=None):
     app = Flask(__name__)
+    app.json = JSONProvider(app)
     
     # Load configuration
     if config_name is None:
         config_name = os.environ.get('FLASK_CONFIG', 'development')
     
     app.config.from_object(f'app.config.{config_name.capitalize()}Config')
+    if app.config['FILE_DELIVERY_MODE'] not in DELIVERY_MODES:
+        raise ValueError(f"FILE_DELIVERY_MODE must be one of {', '.join(DELIVERY_MODES)}")
+    if app.config['SEARCH_BACKEND'] not in SEARCH_BACKENDS:
+        raise ValueError(f"SEARCH_BACKEND must be one of {', '.join(SEARCH_BACKENDS)}")
     
     # Initialize extensions with app
     db.init_app(app)
+    replica_router.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     bcrypt.init_app(app)
+    password_hasher.init_app(app)
     
     # Configure CORS
-    cors.init_app(app, resources={r"/api/*": {"origins": app.config.get('ALLOWED_ORIGINS', '*'), "supports_credentials": True}})
+    cors.init_app(app, resources={r"/api/*": {"origins": app.config.get('ALLOWED_ORIGINS', '*'), "supports_credentials": True, "expose_headers": ["X-Next-Cursor"]}})
     
     # Configure session with proper Redis connection
     app.config['SESSION_TYPE'] = 'redis'
@@ -44,17 +69,23 @@ def create_app(config_name=None):
     # Get Redis URI from environment or use default with service name
     redis_uri = os.environ.get('REDIS_URI', 'redis://:pass@redis:6379/0')
     try:
-        app.config['SESSION_REDIS'] = redis.from_url(redis_uri)
+        app.config['SESSION_REDIS'] = redis_client(redis_uri, app.config)
         # Test the Redis connection
         app.config['SESSION_REDIS'].ping()
         print("Redis connection successful")
-    except redis.exceptions.ConnectionError as e:
+    except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
         print(f"WARNING: Could not connect to Redis: {e}")
         # Fallback to filesystem session if Redis is not available
         app.config['SESSION_TYPE'] = 'filesystem'
-        print("Using filesystem sessions instead")
+        print("Using filesystem sessions until Redis is back")
     
-    sess.init_app(app)
+    # Redis sessions with a file fallback; switches back once Redis answers
+    session_store.init_app(app)
+    
+    # Caches share the session Redis, and run local-only while it is unreachable
+    catalog_cache.init_app(app)
+    identity_cache.init_app(app)
+    trending.init_app(app)
     
     # Configure static folders for uploads
     uploads_path = os.path.join(app.root_path, 'static', 'uploads')
@@ -62,22 +93,8 @@ def create_app(config_name=None):
     os.makedirs(uploads_path, exist_ok=True)
     os.makedirs(books_path, exist_ok=True)
     
-    # Create placeholder image if it doesn't exist
-    placeholder_path = os.path.join(uploads_path, 'placeholder.png')
-    if not os.path.exists(placeholder_path):
-        print(f"Creating placeholder image at {placeholder_path}")
-        # Create a minimal valid PNG file as placeholder
-        with open(placeholder_path, 'wb') as f:
-            # Minimal valid PNG file (1x1 transparent pixel)
-            png_data = bytes.fromhex(
-                '89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c4'
-                '8900000006624b474400ff00ff00ffa0bda793000000097048597300000b1300'
-                '000b1301009a9c180000000774494d4507e5010101000082d7fb7c0000001d69'
-                '5448450000000000000000000000000000000000000000000000000171361302'
-                '00000009704859730000000049495420000000ae49444154081563600060000'
-                '0000100011a21569800000000049454e44ae426082'
-            )
-            f.write(png_data)
+    # Covers and PDFs live in a sharded, content-addressed store under uploads
+    asset_store.init_app(app)
     
     # Register blueprints
     with app.app_context():
@@ -85,32 +102,66 @@ def create_app(config_name=None):
         from app.routes.books import books_bp
         from app.routes.favorites import favorites_bp
         from app.routes.cart import cart_bp
+        from app.routes.uploads import uploads_bp
+        from app.services.search_service import search_stats
+        from app.services.suggest_service import preload_suggest_index, suggest_stats
+        from app.services.trending_service import trending_stats
         
         app.register_blueprint(auth_bp, url_prefix='/api/auth')
         app.register_blueprint(books_bp, url_prefix='/api/books')
         app.register_blueprint(favorites_bp, url_prefix='/api/favorites')
         app.register_blueprint(cart_bp, url_prefix='/api/cart')
+        app.register_blueprint(uploads_bp, url_prefix='/api/uploads')
         
         # Setup login manager
         login_manager.login_view = 'auth.login'
         
         @login_manager.user_loader
         def load_user(user_id):
-            from app.models import User
-            return User.query.get(user_id)
+            # A cached principal; the full User is only loaded when used
+            return identity_cache.load(user_id)
         
         # Create database tables
         db.create_all()
 
+        # Autocomplete index, so the first keystrokes do not wait for it
+        if app.config['SUGGEST_PRELOAD']:
+            try:
+                preload_suggest_index(app)
+            except SQLAlchemyError as e:
+                print(f"WARNING: Could not build the suggestion index, building it on first use: {e}")
+
+        # Admins only: replica URLs and pool internals are not for the public
+        @app.route('/api/metrics')
+        @admin_required
+        def metrics():
+            return jsonify({
+                "catalog_cache": catalog_cache.stats(),
+                "db_pool": pool_metrics(db.engine),
+                "db_replicas": replica_router.stats(),
+                "password_hasher": password_hasher.stats(),
+                "search": search_stats(),
+                "sessions": session_store.stats(),
+                "suggest": suggest_stats(app),
+                "trending": trending_stats(app),
+                "user_cache": identity_cache.stats()
+            }), 200
+
+        @app.errorhandler(PasswordHasherBusy)
+        def password_hasher_busy(error):
+            response = jsonify({"message": str(error)})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+
         # Add route to serve static files
         @app.route('/api/static/<path:filename>')
         def serve_static(filename):
-            return send_from_directory(app.static_folder, filename)
+            return send_upload(app.static_folder, filename)
         
         # Add specific route for book PDFs to simplify frontend access
         @app.route('/api/books/pdf/<path:filename>')
         def serve_book_pdf(filename):
             books_dir = os.path.join(app.static_folder, 'uploads', 'books')
-            return send_from_directory(books_dir, filename)
+            return send_upload(books_dir, filename)
         
     return app
\ No newline at end of file
@@ -10,6 +10,8 @@ from app.models.genre import Genre
 from app.models.book import Book
 from app.models.favorite import Favorite
 from app.models.cart import Cart
+from app.models.asset import Asset
+from app.models.similarity import BookSimilarity, SimilarityBuild
 
 # All models are now available through this module
-__all__ = ['User', 'Author', 'Genre', 'Book', 'Favorite', 'Cart']
\ No newline at end of file
+__all__ = ['User', 'Author', 'Genre', 'Book', 'Favorite', 'Cart', 'Asset', 'BookSimilarity', 'SimilarityBuild']
\ No newline at end of file
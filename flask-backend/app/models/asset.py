@@ -0,0 +1,27 @@
+# app/models/asset.py
+import uuid
+from datetime import datetime
+from app import db
+from sqlalchemy.dialects.postgresql import UUID
+
+class Asset(db.Model):
+    __tablename__ = 'assets'
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # <sha256><ext>, the name books refer to the file by
+    name = db.Column(db.String(80), unique=True, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    # Number of book image/pdf columns pointing at this file
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'size': self.size,
+            'refcount': self.refcount,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
@@ -17,8 +17,8 @@ class Author(db.Model):
     
     def to_dict(self):
         return {
-            'id': str(self.id),
+            'id': self.id,
             'name': self.name,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
\ No newline at end of file
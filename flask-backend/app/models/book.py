@@ -2,10 +2,27 @@
 import uuid
 from datetime import datetime
 from app import db
+from sqlalchemy import bindparam, event, func, inspect, literal_column, select, update
 from sqlalchemy.dialects.postgresql import UUID
+from app.models.author import Author
+from app.utils.text_search import search_document
 
 class Book(db.Model):
     __tablename__ = 'books'
+    __table_args__ = (
+        # Keyset pagination walks (created_at, id), optionally within a genre or author
+        db.Index('ix_books_created_at_id', 'created_at', 'id'),
+        db.Index('ix_books_genre_created_at_id', 'genre_id', 'created_at', 'id'),
+        db.Index('ix_books_author_created_at_id', 'author_id', 'created_at', 'id'),
+        db.Index('ix_books_year', 'year'),
+        db.Index('ix_books_price', 'price'),
+        # Full-text search; search_document holds normalized words already
+        db.Index(
+            'ix_books_search_vector',
+            db.text("to_tsvector('simple'::regconfig, search_document)"),
+            postgresql_using='gin',
+        ),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = db.Column(db.String(255), nullable=False)
@@ -21,6 +38,9 @@ class Book(db.Model):
     genre_id = db.Column(UUID(as_uuid=True), db.ForeignKey('genres.id'), nullable=False)
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
     
+    # Normalized title and author name for search; kept current by the events below
+    search_document = db.Column(db.Text, nullable=False, default='', server_default='')
+    
     # Relationships
     author = db.relationship('Author', back_populates='books')
     genre = db.relationship('Genre', back_populates='books')
@@ -30,18 +50,55 @@ class Book(db.Model):
     
     def to_dict(self, with_relations=True):
         data = {
-            'id': str(self.id),
+            'id': self.id,
             'title': self.title,
             'year': self.year,
             'image': self.image,
             'pdf': self.pdf,
             'price': self.price,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
         
         if with_relations:
             data['author'] = self.author.to_dict() if self.author else None
             data['genre'] = {'name': self.genre.name} if self.genre else None
             
-        return data
\ No newline at end of file
+        return data
+
+
+# The expression of ix_books_search_vector, for queries to use the index
+SEARCH_VECTOR = func.to_tsvector(literal_column("'simple'::regconfig"), Book.search_document)
+
+
+def _author_name(connection, book):
+    if 'author' in book.__dict__ and book.author is not None:
+        return book.author.name
+    return connection.scalar(select(Author.name).where(Author.id == book.author_id))
+
+
+@event.listens_for(Book, 'before_insert')
+def _index_new_book(mapper, connection, book):
+    book.search_document = search_document(book.title, _author_name(connection, book))
+
+
+@event.listens_for(Book, 'before_update')
+def _reindex_book(mapper, connection, book):
+    state = inspect(book)
+    if any(state.attrs[name].history.has_changes() for name in ('title', 'author_id', 'author')):
+        book.search_document = search_document(book.title, _author_name(connection, book))
+
+
+@event.listens_for(Author, 'after_update')
+def _reindex_author_books(mapper, connection, author):
+    if not inspect(author).attrs.name.history.has_changes():
+        return
+    books = connection.execute(select(Book.id, Book.title).where(Book.author_id == author.id)).all()
+    if books:
+        books_table = Book.__table__
+        connection.execute(
+            update(books_table)
+            .where(books_table.c.id == bindparam('book_id'))
+            .values(search_document=bindparam('document')),
+            [{'book_id': book_id, 'document': search_document(title, author.name)} for book_id, title in books],
+        )
@@ -6,6 +6,10 @@ from sqlalchemy.dialects.postgresql import UUID
 
 class Favorite(db.Model):
     __tablename__ = 'favorites'
+    __table_args__ = (
+        # One row per user and book; adds rely on it with ON CONFLICT DO NOTHING
+        db.Index('uq_favorites_user_id_book_id', 'user_id', 'book_id', unique=True),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
@@ -19,11 +23,11 @@ class Favorite(db.Model):
     
     def to_dict(self, with_book=False):
         data = {
-            'id': str(self.id),
-            'user_id': str(self.user_id),
-            'book_id': str(self.book_id),
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'id': self.id,
+            'user_id': self.user_id,
+            'book_id': self.book_id,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
         
         if with_book:
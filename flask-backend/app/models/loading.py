@@ -0,0 +1,30 @@
+# app/models/loading.py
+"""
+Eager-loading options matching what each to_dict() serializes.
+Apply them to queries whose rows are serialized with their relations so the
+related rows come back in the same statement instead of one lazy load per row.
+"""
+from sqlalchemy.orm import joinedload
+from app.models.book import Book
+from app.models.cart import Cart
+from app.models.favorite import Favorite
+
+
+def book_options():
+    """Options for Book.to_dict(with_relations=True)"""
+    return (joinedload(Book.author), joinedload(Book.genre))
+
+
+def _with_book(relationship):
+    book = joinedload(relationship)
+    return (book.joinedload(Book.author), book.joinedload(Book.genre))
+
+
+def favorite_options(favorite=Favorite):
+    """Options for Favorite.to_dict(with_book=True); favorite may be an alias"""
+    return _with_book(favorite.book)
+
+
+def cart_options(cart=Cart):
+    """Options for Cart.to_dict(with_book=True); cart may be an alias"""
+    return _with_book(cart.book)
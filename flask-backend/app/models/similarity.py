@@ -0,0 +1,47 @@
+# app/models/similarity.py
+from datetime import datetime
+from app import db
+from sqlalchemy.dialects.postgresql import UUID
+
+# One of a book's top neighbors by cosine similarity, written by `flask recs build`
+class BookSimilarity(db.Model):
+    __tablename__ = 'book_similarities'
+    __table_args__ = (
+        # Deleting a book deletes the rows naming it as a neighbor
+        db.Index('ix_book_similarities_similar_book_id', 'similar_book_id'),
+    )
+    
+    # Keyed by (book_id, rank): a book's list is one index range scan
+    book_id = db.Column(UUID(as_uuid=True), db.ForeignKey('books.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    similar_book_id = db.Column(UUID(as_uuid=True), db.ForeignKey('books.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+# One run of `flask recs build`; the last one tells the next where to pick up
+class SimilarityBuild(db.Model):
+    __tablename__ = 'similarity_builds'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    finished_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Newest favorite or cart row read, and how many rows there were
+    watermark = db.Column(db.DateTime, nullable=True)
+    interactions = db.Column(db.Integer, nullable=False)
+    # Sum of the rows' hashes, to tell whether the next build sees the same rows
+    checksum = db.Column(db.BigInteger, nullable=True)
+    # Books whose neighbors were recomputed, and neighbors written
+    books = db.Column(db.Integer, nullable=False)
+    pairs = db.Column(db.Integer, nullable=False)
+    full = db.Column(db.Boolean, nullable=False)
+    seconds = db.Column(db.Float, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'finished_at': self.finished_at,
+            'watermark': self.watermark,
+            'interactions': self.interactions,
+            'books': self.books,
+            'pairs': self.pairs,
+            'full': self.full,
+            'seconds': self.seconds
+        }
@@ -2,8 +2,9 @@
 import uuid
 from datetime import datetime
 from flask_login import UserMixin
-from app import db, bcrypt
+from app import db, password_hasher
 from sqlalchemy.dialects.postgresql import UUID
+from app.models.loading import favorite_options, cart_options
 
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
@@ -26,22 +27,29 @@ class User(db.Model, UserMixin):
         self.set_password(password)
     
     def set_password(self, password):
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password = password_hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password, password)
+        return password_hasher.check(self.password, password)
+    
+    def needs_rehash(self):
+        """Whether the password hash was made with a different cost than configured"""
+        return password_hasher.needs_rehash(self.password)
     
     def to_dict(self, with_relations=False):
         data = {
-            'id': str(self.id),
+            'id': self.id,
             'email': self.email,
             'username': self.username,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
         
         if with_relations:
-            data['Favorite'] = [favorite.to_dict(with_book=True) for favorite in self.favorites]
-            data['Cart'] = [cart_item.to_dict(with_book=True) for cart_item in self.cart_items]
+            # One statement per collection, with book, author and genre joined in
+            favorites = self.favorites.options(*favorite_options())
+            cart_items = self.cart_items.options(*cart_options())
+            data['Favorite'] = [favorite.to_dict(with_book=True) for favorite in favorites]
+            data['Cart'] = [cart_item.to_dict(with_book=True) for cart_item in cart_items]
         
         return data
\ No newline at end of file
@@ -1,8 +1,9 @@
 # app/routes/auth.py
 from flask import Blueprint, request, jsonify, session
 from flask_login import login_user, logout_user, current_user, login_required
-from app import db
+from app import db, password_hasher, identity_cache
 from app.models import User
+from app.utils.db_routing import read_replica
 import uuid
 
 auth_bp = Blueprint('auth', __name__)
@@ -77,10 +78,16 @@ def login():
     if not user.check_password(password):
         return jsonify({"message": "Password is incorrect"}), 401
     
+    # Upgrade hashes made with an old cost factor while the password is at hand
+    if user.needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+        password_hasher.record_rehash()
+    
     # Login user and create session
     login_user(user)
+    identity_cache.store(user)
     session.permanent = True
-    session['user_id'] = str(user.id)
     
     return jsonify({
         "message": "Login successful",
@@ -91,16 +98,17 @@ def login():
 @auth_bp.route('/logout', methods=['POST'])
 @login_required
 def logout():
+    identity_cache.invalidate(current_user.id)
     logout_user()
     
-    # Clear session
-    for key in list(session.keys()):
-        session.pop(key, None)
-        
+    # An empty session is deleted from the store in one call
+    session.clear()
+    
     return jsonify({"message": "Logout successful"}), 200
 
 
 @auth_bp.route('/me', methods=['GET'])
+@read_replica
 @login_required
 def get_me():
     # Get current user data
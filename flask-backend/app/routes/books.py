@@ -1,118 +1,199 @@
 # app/routes/books.py
-from flask import Blueprint, jsonify, request
+import os
+from flask import Blueprint, jsonify, request, current_app
 from app import db
-from app.models import Book, Author, Genre
-from app.data.books_data import GENRE_DATA, AUTHOR_DATA, BOOKS_DATA
+from app.services.book_service import get_cached_books_page, get_cached_book, get_cached_facets, parse_int
+from app.services.cover_service import (
+    COVER_FORMATS, derivatives_directory, get_cover_name, get_cover
+)
+from app.services.recommendation_service import get_cached_similar
+from app.services.search_service import get_cached_search
+from app.services.seed_service import seed_default_catalog
+from app.services.suggest_service import suggest
+from app.services.trending_service import get_trending_entry
+from app.utils.text_search import tokenize
+from app.utils.db_routing import read_replica
+from app.utils.file_delivery import send_path, send_placeholder
 
 books_bp = Blueprint('books', __name__)
 
+def cached_json_response(entry):
+    """Build a response from a pre-serialized entry, answering 304 when the ETag matches"""
+    response = current_app.response_class(entry['body'], mimetype='application/json')
+    response.set_etag(entry['etag'])
+    # Let clients store the response but revalidate it on every use
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @books_bp.route('', methods=['GET'])
+@read_replica
 def get_all_books():
-    """Get all books with author and genre information"""
-    books = Book.query.all()
-    return jsonify([book.to_dict() for book in books]), 200
+    """Get one page of books with author and genre information"""
+    page_size = current_app.config['BOOKS_PAGE_SIZE']
+    max_page_size = current_app.config['BOOKS_MAX_PAGE_SIZE']
+
+    try:
+        limit = parse_int(request.args, 'limit')
+        if limit is None:
+            limit = page_size
+        if limit < 1 or limit > max_page_size:
+            raise ValueError(f"'limit' must be between 1 and {max_page_size}")
+
+        page = get_cached_books_page(request.args, limit)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    response = cached_json_response(page)
+    # The body stays a plain list; the next page is announced in a header
+    if page['next_cursor']:
+        response.headers['X-Next-Cursor'] = page['next_cursor']
+    return response
+
+@books_bp.route('/facets', methods=['GET'])
+@read_replica
+def get_book_facets():
+    """Count books per genre, author, year and price band for the filter sidebar"""
+    try:
+        facets = get_cached_facets(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    return cached_json_response(facets)
+
+@books_bp.route('/trending', methods=['GET'])
+@read_replica
+def get_trending_books():
+    """Get the books added to favorites and carts most lately, most popular first"""
+    # Precomputed per worker; see app/services/trending_service.py
+    return cached_json_response(get_trending_entry())
+
+@books_bp.route('/search', methods=['GET'])
+@read_replica
+def search_books():
+    """Search books by title and author name, best matches first"""
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({"message": "Query 'q' is required"}), 400
+    
+    max_limit = current_app.config['SEARCH_MAX_LIMIT']
+    try:
+        limit = parse_int(request.args, 'limit')
+        if limit is None:
+            limit = current_app.config['SEARCH_LIMIT']
+        if limit < 1 or limit > max_limit:
+            raise ValueError(f"'limit' must be between 1 and {max_limit}")
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    if not tokenize(query):
+        return jsonify([]), 200
+    return cached_json_response(get_cached_search(query, limit))
+
+@books_bp.route('/suggest', methods=['GET'])
+def suggest_books():
+    """Suggest book titles and authors starting with a prefix, most popular first"""
+    max_limit = current_app.config['SUGGEST_MAX_LIMIT']
+    try:
+        limit = parse_int(request.args, 'limit')
+        if limit is None:
+            limit = current_app.config['SUGGEST_LIMIT']
+        if limit < 1 or limit > max_limit:
+            raise ValueError(f"'limit' must be between 1 and {max_limit}")
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    # Served from this worker's memory; no database query per keystroke
+    return jsonify(suggest(request.args.get('prefix', ''), limit)), 200
 
 @books_bp.route('/<book_id>', methods=['GET'])
+@read_replica
 def get_book(book_id):
     """Get a specific book by ID"""
-    book = Book.query.filter_by(id=book_id).first()
+    book = get_cached_book(book_id)
     
     if not book:
         return jsonify({"message": "Book not found"}), 404
         
-    return jsonify(book.to_dict()), 200
-# Modified version of the seeding function for app/routes/books.py
+    return cached_json_response(book)
+
+@books_bp.route('/<book_id>/similar', methods=['GET'])
+@read_replica
+def get_similar_books(book_id):
+    """Get the books most often kept together with this one, most similar first"""
+    max_limit = current_app.config['RECS_NEIGHBORS']
+    try:
+        limit = parse_int(request.args, 'limit')
+        if limit is None:
+            limit = min(current_app.config['RECS_LIMIT'], max_limit)
+        if limit < 1 or limit > max_limit:
+            raise ValueError(f"'limit' must be between 1 and {max_limit}")
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    # Precomputed by `flask recs build`; see app/services/recommendation_service.py
+    similar = get_cached_similar(book_id, limit)
+    if similar is None:
+        return jsonify({"message": "Book not found"}), 404
+    
+    return cached_json_response(similar)
+
+@books_bp.route('/<book_id>/cover', methods=['GET'])
+def get_book_cover(book_id):
+    """
+    Get a book cover resized to one of COVER_WIDTHS.
+
+    The format is WebP when the client accepts it and JPEG otherwise, unless
+    'format' asks for one. Passing the current image name as 'v' makes the
+    response cacheable for good, since a new cover changes the URL.
+    """
+    config = current_app.config
+    try:
+        width = parse_int(request.args, 'w')
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if width is None:
+        width = config['COVER_DEFAULT_WIDTH']
+    if width not in config['COVER_WIDTHS']:
+        allowed = ', '.join(str(w) for w in config['COVER_WIDTHS'])
+        return jsonify({"message": f"'w' must be one of {allowed}"}), 400
+
+    fmt = request.args.get('format')
+    if fmt is not None and fmt not in COVER_FORMATS:
+        return jsonify({"message": f"'format' must be one of {', '.join(COVER_FORMATS)}"}), 400
+    negotiated = fmt is None
+    if negotiated:
+        # Only an explicit image/webp counts: browsers without WebP support
+        # still send */* or image/*, which accept_mimetypes[...] would match
+        webp = any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes)
+        fmt = 'webp' if webp else 'jpeg'
+
+    image = get_cover_name(book_id)
+    if image is None:
+        return jsonify({"message": "Book not found"}), 404
+
+    path = get_cover(image, width, fmt) if image else None
+    if path is None:
+        response = send_placeholder('cover.png')
+    else:
+        # Without Pillow, or for an unreadable image, the original is sent
+        derivative = path.startswith(derivatives_directory())
+        response = send_path(
+            path,
+            immutable=request.args.get('v') == image,
+            etag=os.path.splitext(os.path.basename(path))[0] if derivative else True,
+            mimetype=COVER_FORMATS[fmt][1] if derivative else None
+        )
+    if negotiated:
+        response.vary.add('Accept')
+    return response
 
 @books_bp.route('/seed', methods=['POST'])
 def seed_books():
     """Seed the database with books data (admin only in production)"""
     try:
-        # Import book_utils
-        from app.utils.book_utils import ensure_upload_directories
-        
-        # Ensure uploads directory exists
-        uploads_dir = ensure_upload_directories()
-        
-        # Create genres if they don't exist
-        genres = {}
-        for genre_item in GENRE_DATA:
-            genre = Genre.query.filter_by(name=genre_item["name"]).first()
-            if not genre:
-                genre = Genre(name=genre_item["name"])
-                db.session.add(genre)
-                db.session.flush()  # To get the ID before commit
-            genres[genre.name] = genre
-            
-        # Create authors if they don't exist
-        authors = {}
-        for author_item in AUTHOR_DATA:
-            author = Author.query.filter_by(name=author_item["name"]).first()
-            if not author:
-                author = Author(name=author_item["name"])
-                db.session.add(author)
-                db.session.flush()  # To get the ID before commit
-            authors[author.name] = author
-            
-        # Create placeholder files if needed
-        # Create an empty placeholder image if it doesn't exist
-        placeholder_path = os.path.join(uploads_dir, 'placeholder.png')
-        if not os.path.exists(placeholder_path):
-            with open(placeholder_path, 'wb') as f:
-                # Minimal valid PNG file (1x1 transparent pixel)
-                png_data = bytes.fromhex(
-                    '89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c4'
-                    '8900000006624b474400ff00ff00ffa0bda793000000097048597300000b1300'
-                    '000b1301009a9c180000000774494d4507e5010101000082d7fb7c0000001d69'
-                    '5448450000000000000000000000000000000000000000000000000171361302'
-                    '00000009704859730000000049495420000000ae49444154081563600060000'
-                    '0000100011a21569800000000049454e44ae426082'
-                )
-                f.write(png_data)
-            
-        # Create books from the imported book data
-        for book_data in BOOKS_DATA:
-            # Check if the book already exists by title
-            existing_book = Book.query.filter_by(title=book_data["title"]).first()
-            if not existing_book:
-                # Get author and genre
-                author = authors.get(book_data["author"])
-                genre = genres.get(book_data["genre"])
-                
-                if not author or not genre:
-                    continue
-                
-                # Check if image file exists, or create placeholder entry
-                image_path = os.path.join(uploads_dir, book_data["image"])
-                if not os.path.exists(image_path):
-                    # If image doesn't exist, create an empty file as a placeholder
-                    with open(image_path, 'w') as f:
-                        f.write('')
-                
-                # Check if PDF file exists, or create placeholder entry
-                pdf_path = os.path.join(uploads_dir, book_data["bookUrl"])
-                if not os.path.exists(pdf_path):
-                    # If PDF doesn't exist, create an empty file as a placeholder
-                    with open(pdf_path, 'w') as f:
-                        f.write('PDF placeholder for: ' + book_data["title"])
-                
-                # Create the book
-                new_book = Book(
-                    title=book_data["title"],
-                    year=book_data["year"],
-                    image=book_data["image"],
-                    pdf=book_data["bookUrl"],
-                    price=book_data["price"],
-                    author_id=author.id,
-                    genre_id=genre.id
-                )
-                
-                db.session.add(new_book)
-                
-        # Commit all the changes
-        db.session.commit()
-        
-        return jsonify({"message": "Database seeded successfully"}), 201
+        summary = seed_default_catalog()
+        return jsonify(dict(summary, message="Database seeded successfully")), 201
     
     except Exception as e:
         db.session.rollback()
-        return jsonify({"message": f"Error seeding database: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"message": f"Error seeding database: {str(e)}"}), 500
@@ -1,11 +1,53 @@
 # app/routes/cart.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_login import login_required, current_user
-from app import db
-from app.models import Cart, Book
+from app import db, trending
+from app.models import Cart
+from app.models.loading import cart_options
+from app.services.book_service import parse_int
+from app.services.collection_service import (
+    CollectionError, add_item, change_items, get_book_ids, get_items_page, parse_book_id, parse_book_ids
+)
 
 cart_bp = Blueprint('cart', __name__)
 
+@cart_bp.errorhandler(CollectionError)
+def handle_collection_error(error):
+    return jsonify({"message": error.message}), error.status
+
+@cart_bp.route('', methods=['GET'])
+@login_required
+def get_cart():
+    """
+    Get one page of user's cart with book information, or with
+    'fields=ids' just the ids of all its books and their count.
+    """
+    fields = request.args.get('fields')
+    if fields == 'ids':
+        book_ids = get_book_ids(Cart, current_user.id)
+        return jsonify({"book_ids": book_ids, "total": len(book_ids)}), 200
+    if fields:
+        return jsonify({"message": "'fields' must be 'ids'"}), 400
+    
+    max_page_size = current_app.config['COLLECTION_MAX_PAGE_SIZE']
+    try:
+        limit = parse_int(request.args, 'limit')
+        if limit is None:
+            limit = current_app.config['COLLECTION_PAGE_SIZE']
+        if limit < 1 or limit > max_page_size:
+            raise ValueError(f"'limit' must be between 1 and {max_page_size}")
+        
+        items, next_cursor = get_items_page(Cart, current_user.id, request.args.get('cursor'), limit, options=cart_options)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    # Like the books list: a plain list, with the next page in a header
+    response = jsonify([item.to_dict(with_book=True) for item in items])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
 @cart_bp.route('', methods=['POST'])
 @login_required
 def add_to_cart():
@@ -15,36 +57,19 @@ def add_to_cart():
     if not data:
         return jsonify({"message": "No input data provided"}), 400
     
-    book_id = data.get('bookId')
-    
-    if not book_id:
-        return jsonify({"message": "Book ID is required"}), 400
-    
-    # Check if the book exists
-    book = Book.query.filter_by(id=book_id).first()
-    if not book:
-        return jsonify({"message": "Book not found"}), 404
-    
-    # Check if the book is already in cart
-    existing_cart_item = Cart.query.filter_by(
-        user_id=current_user.id,
-        book_id=book_id
-    ).first()
-    
-    if existing_cart_item:
-        return jsonify({"message": "Book is already in cart"}), 409
-    
-    # Add book to cart
-    new_cart_item = Cart(
-        user_id=current_user.id,
-        book_id=book_id
-    )
+    book_id = parse_book_id(data.get('bookId'))
     
+    # One statement: the unique index catches duplicates, the foreign key missing books
     try:
-        db.session.add(new_cart_item)
+        cart_item = add_item(Cart, current_user.id, book_id, options=cart_options)
+        if cart_item is None:
+            return jsonify({"message": "Book is already in cart"}), 409
+        data = cart_item.to_dict(with_book=True)
         db.session.commit()
-        return jsonify(new_cart_item.to_dict(with_book=True)), 201
-    
+        trending.record('cart', added=[book_id])
+        return jsonify(data), 201
+    except CollectionError:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": f"Error adding to cart: {str(e)}"}), 500
@@ -63,10 +88,61 @@ def remove_from_cart(cart_id):
         return jsonify({"message": "Cart item not found"}), 404
     
     try:
+        # Read before the commit expires it
+        removal = (cart_item.book_id, cart_item.created_at)
         db.session.delete(cart_item)
         db.session.commit()
+        trending.record('cart', removed=[removal])
         return jsonify({"message": "Item removed from cart successfully"}), 200
     
     except Exception as e:
         db.session.rollback()
-        return jsonify({"message": f"Error removing item from cart: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"message": f"Error removing item from cart: {str(e)}"}), 500
+
+
+@cart_bp.route('/batch', methods=['POST'])
+@login_required
+def change_cart():
+    """Add and remove several books in user's cart at once"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({"message": "No input data provided"}), 400
+    
+    limit = current_app.config['COLLECTION_BATCH_LIMIT']
+    add = parse_book_ids(data.get('add'), limit)
+    remove = parse_book_ids(data.get('remove'), limit)
+    if set(add) & set(remove):
+        return jsonify({"message": "A book cannot be both added and removed"}), 400
+    
+    try:
+        result = change_items(Cart, current_user.id, add=add, remove=remove, options=cart_options)
+        data = result.to_dict('Cart')
+        db.session.commit()
+        trending.record('cart', added=result.added, removed=result.removals)
+        return jsonify(data), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": f"Error changing cart: {str(e)}"}), 500
+
+
+@cart_bp.route('', methods=['PUT'])
+@login_required
+def sync_cart():
+    """Make user's cart exactly the given books"""
+    data = request.get_json()
+    
+    if not data or 'bookIds' not in data:
+        return jsonify({"message": "Book IDs are required"}), 400
+    
+    book_ids = parse_book_ids(data['bookIds'], current_app.config['COLLECTION_BATCH_LIMIT'])
+    
+    try:
+        result = change_items(Cart, current_user.id, add=book_ids, sync=True, options=cart_options)
+        data = result.to_dict('Cart')
+        db.session.commit()
+        trending.record('cart', added=result.added, removed=result.removals)
+        return jsonify(data), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": f"Error syncing cart: {str(e)}"}), 500
@@ -1,11 +1,53 @@
 # app/routes/favorites.py
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, session
 from flask_login import login_required, current_user
-from app import db
-from app.models import Favorite, Book
+from app import db, trending
+from app.models import Favorite
+from app.models.loading import favorite_options
+from app.services.book_service import parse_int
+from app.services.collection_service import (
+    CollectionError, add_item, change_items, get_book_ids, get_items_page, parse_book_id, parse_book_ids
+)
 
 favorites_bp = Blueprint('favorites', __name__)
 
+@favorites_bp.errorhandler(CollectionError)
+def handle_collection_error(error):
+    return jsonify({"message": error.message}), error.status
+
+@favorites_bp.route('', methods=['GET'])
+@login_required
+def get_favorites():
+    """
+    Get one page of user's favorites with book information, or with
+    'fields=ids' just the ids of all its books and their count.
+    """
+    fields = request.args.get('fields')
+    if fields == 'ids':
+        book_ids = get_book_ids(Favorite, current_user.id)
+        return jsonify({"book_ids": book_ids, "total": len(book_ids)}), 200
+    if fields:
+        return jsonify({"message": "'fields' must be 'ids'"}), 400
+    
+    max_page_size = current_app.config['COLLECTION_MAX_PAGE_SIZE']
+    try:
+        limit = parse_int(request.args, 'limit')
+        if limit is None:
+            limit = current_app.config['COLLECTION_PAGE_SIZE']
+        if limit < 1 or limit > max_page_size:
+            raise ValueError(f"'limit' must be between 1 and {max_page_size}")
+        
+        items, next_cursor = get_items_page(Favorite, current_user.id, request.args.get('cursor'), limit, options=favorite_options)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    # Like the books list: a plain list, with the next page in a header
+    response = jsonify([item.to_dict(with_book=True) for item in items])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
 @favorites_bp.route('', methods=['POST'])
 @login_required
 def add_favorite():
@@ -15,36 +57,19 @@ def add_favorite():
     if not data:
         return jsonify({"message": "No input data provided"}), 400
     
-    book_id = data.get('bookId')
-    
-    if not book_id:
-        return jsonify({"message": "Book ID is required"}), 400
-    
-    # Check if the book exists
-    book = Book.query.filter_by(id=book_id).first()
-    if not book:
-        return jsonify({"message": "Book not found"}), 404
-    
-    # Check if the book is already in favorites
-    existing_favorite = Favorite.query.filter_by(
-        user_id=current_user.id,
-        book_id=book_id
-    ).first()
-    
-    if existing_favorite:
-        return jsonify({"message": "Book is already in favorites"}), 409
-    
-    # Add book to favorites
-    new_favorite = Favorite(
-        user_id=current_user.id,
-        book_id=book_id
-    )
+    book_id = parse_book_id(data.get('bookId'))
     
+    # One statement: the unique index catches duplicates, the foreign key missing books
     try:
-        db.session.add(new_favorite)
+        favorite = add_item(Favorite, current_user.id, book_id)
+        if favorite is None:
+            return jsonify({"message": "Book is already in favorites"}), 409
+        data = favorite.to_dict()
         db.session.commit()
-        return jsonify(new_favorite.to_dict()), 201
-    
+        trending.record('favorite', added=[book_id])
+        return jsonify(data), 201
+    except CollectionError:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": f"Error adding to favorites: {str(e)}"}), 500
@@ -63,10 +88,61 @@ def remove_favorite(favorite_id):
         return jsonify({"message": "Favorite not found"}), 404
     
     try:
+        # Read before the commit expires it
+        removal = (favorite.book_id, favorite.created_at)
         db.session.delete(favorite)
         db.session.commit()
+        trending.record('favorite', removed=[removal])
         return jsonify({"message": "Favorite removed successfully"}), 200
     
     except Exception as e:
         db.session.rollback()
-        return jsonify({"message": f"Error removing favorite: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"message": f"Error removing favorite: {str(e)}"}), 500
+
+
+@favorites_bp.route('/batch', methods=['POST'])
+@login_required
+def change_favorites():
+    """Add and remove several books in user's favorites at once"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({"message": "No input data provided"}), 400
+    
+    limit = current_app.config['COLLECTION_BATCH_LIMIT']
+    add = parse_book_ids(data.get('add'), limit)
+    remove = parse_book_ids(data.get('remove'), limit)
+    if set(add) & set(remove):
+        return jsonify({"message": "A book cannot be both added and removed"}), 400
+    
+    try:
+        result = change_items(Favorite, current_user.id, add=add, remove=remove, options=favorite_options)
+        data = result.to_dict('Favorite')
+        db.session.commit()
+        trending.record('favorite', added=result.added, removed=result.removals)
+        return jsonify(data), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": f"Error changing favorites: {str(e)}"}), 500
+
+
+@favorites_bp.route('', methods=['PUT'])
+@login_required
+def sync_favorites():
+    """Make user's favorites exactly the given books"""
+    data = request.get_json()
+    
+    if not data or 'bookIds' not in data:
+        return jsonify({"message": "Book IDs are required"}), 400
+    
+    book_ids = parse_book_ids(data['bookIds'], current_app.config['COLLECTION_BATCH_LIMIT'])
+    
+    try:
+        result = change_items(Favorite, current_user.id, add=book_ids, sync=True, options=favorite_options)
+        data = result.to_dict('Favorite')
+        db.session.commit()
+        trending.record('favorite', added=result.added, removed=result.removals)
+        return jsonify(data), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": f"Error syncing favorites: {str(e)}"}), 500
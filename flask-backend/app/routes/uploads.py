@@ -0,0 +1,80 @@
+# app/routes/uploads.py
+import os
+from flask import Blueprint, jsonify, request
+from flask_login import current_user
+from app.utils.security import admin_required
+from app.utils.book_utils import UPLOAD_EXTENSIONS, UploadTooLarge, save_stream
+from app.services.upload_service import (
+    UploadError, create_upload, get_upload, append_chunk, complete_upload
+)
+
+uploads_bp = Blueprint('uploads', __name__)
+
+@uploads_bp.errorhandler(UploadError)
+def handle_upload_error(error):
+    return jsonify({"message": error.message}), error.status
+
+
+@uploads_bp.route('', methods=['POST'])
+@admin_required
+def start_upload():
+    """Open a resumable upload session"""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"message": "No input data provided"}), 400
+
+    upload = create_upload(
+        kind=data.get('kind'),
+        filename=data.get('filename'),
+        size=data.get('size'),
+        user_id=current_user.id,
+        sha256=data.get('sha256')
+    )
+    return jsonify(upload), 201
+
+
+@uploads_bp.route('/<upload_id>', methods=['GET'])
+@admin_required
+def upload_status(upload_id):
+    """Get the offset to resume an upload from"""
+    return jsonify(get_upload(upload_id, current_user.id)), 200
+
+
+@uploads_bp.route('/<upload_id>', methods=['PATCH'])
+@admin_required
+def upload_chunk(upload_id):
+    """Append a raw chunk starting at the Upload-Offset header"""
+    offset = request.headers.get('Upload-Offset', type=int)
+
+    if offset is None:
+        return jsonify({"message": "Upload-Offset header is required"}), 400
+
+    upload = append_chunk(upload_id, offset, request.stream, current_user.id)
+    return jsonify(upload), 200
+
+
+@uploads_bp.route('/<upload_id>/complete', methods=['POST'])
+@admin_required
+def finish_upload(upload_id):
+    """Verify the upload and store it under the hash of its content"""
+    result = complete_upload(upload_id, current_user.id)
+    return jsonify(result), 201
+
+
+@uploads_bp.route('/stream/<kind>', methods=['PUT'])
+@admin_required
+def stream_upload(kind):
+    """Upload a file of up to MAX_CONTENT_LENGTH in one request, with the raw file as the body"""
+    if kind not in UPLOAD_EXTENSIONS:
+        return jsonify({"message": "Upload not found"}), 404
+
+    ext = os.path.splitext(request.args.get('filename', ''))[1].lower()
+    if ext not in UPLOAD_EXTENSIONS[kind]:
+        return jsonify({"message": f"Unsupported {kind} file type: {ext or 'none'}"}), 400
+
+    try:
+        result = save_stream(request.stream, kind, ext)
+    except UploadTooLarge as e:
+        return jsonify({"message": str(e)}), 413
+    return jsonify(result), 201
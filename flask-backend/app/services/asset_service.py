@@ -0,0 +1,92 @@
+# app/services/asset_service.py
+"""
+Maintenance of the content-addressed asset store.
+"""
+import os
+from flask import current_app
+from sqlalchemy import bindparam, update
+from app import db, catalog_cache
+from app.models import Book
+from app.utils.asset_store import PLACEHOLDER_PNG, PLACEHOLDER_PDF
+from app.utils.book_utils import ensure_upload_directories
+
+# Text the old seeding wrote into missing PDFs
+SEED_PLACEHOLDER_PREFIX = b'PDF placeholder for: '
+
+
+def is_placeholder_file(path):
+    """Whether a file is an empty or copied placeholder rather than real content"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return True
+    if size > max(len(PLACEHOLDER_PDF), 4096):
+        return False
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data in (PLACEHOLDER_PNG, PLACEHOLDER_PDF) or data.startswith(SEED_PLACEHOLDER_PREFIX)
+
+
+def migrate_uploads(dry_run=False):
+    """
+    Move flat uploads into the asset store and point books at the stored names.
+
+    Covers come from the uploads folder and PDFs from uploads/books (or the
+    uploads folder, where older seeding put them). Empty and placeholder files
+    are deleted instead, since missing files are served as placeholders.
+
+    Files are copied into the store and only deleted from the flat folders
+    once the books pointing at them are committed, so an interrupted run
+    can simply be started again. Returns a summary of what was done.
+    """
+    store = current_app.extensions['asset_store']
+    uploads_dir = ensure_upload_directories()
+    summary = {'stored': 0, 'duplicates': 0, 'placeholders_removed': 0, 'books_updated': 0}
+    renamed = {}
+    stored_paths = []
+
+    for folder in ('', 'books'):
+        directory = os.path.join(uploads_dir, folder)
+        if not os.path.isdir(directory):
+            continue
+        renamed[folder] = {}
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.name.startswith('.'):
+                continue
+            if entry.name == 'placeholder.png' or is_placeholder_file(entry.path):
+                summary['placeholders_removed'] += 1
+                if not dry_run:
+                    os.remove(entry.path)
+                continue
+            if dry_run:
+                summary['stored'] += 1
+                continue
+            name, duplicate = store.put_path(entry.path)
+            summary['duplicates' if duplicate else 'stored'] += 1
+            renamed[folder][entry.name] = name
+            stored_paths.append(entry.path)
+
+    if dry_run:
+        return summary
+
+    books = Book.__table__
+    images = renamed.get('', {})
+    pdfs = {**images, **renamed.get('books', {})}
+    for column, mapping in (('image', images), ('pdf', pdfs)):
+        if not mapping:
+            continue
+        # One executemany per column instead of loading every book
+        result = db.session.execute(
+            update(books).where(books.c[column] == bindparam('old_name')).values({column: bindparam('new_name')}),
+            [{'old_name': old, 'new_name': new} for old, new in mapping.items()]
+        )
+        summary['books_updated'] += max(result.rowcount, 0)
+
+    # Bulk updates bypass the ORM events that keep counts and caches current
+    store.recount()
+    db.session.commit()
+    catalog_cache.invalidate()
+
+    # Only now that books refer to the stored copies
+    for path in stored_paths:
+        os.remove(path)
+    return summary
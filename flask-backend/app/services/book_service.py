@@ -0,0 +1,235 @@
+# app/services/book_service.py
+"""
+Catalog queries shared by the books blueprint.
+"""
+import base64
+import hashlib
+import json
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode
+from flask import current_app
+from sqlalchemy import and_, case, func, or_, select, text, tuple_
+from app import db, catalog_cache
+from app.models import Book, Author, Genre
+from app.models.loading import book_options
+
+
+# Query arguments that change the contents of a page
+PAGE_ARGS = ('cursor', 'genre', 'author', 'year_from', 'year_to', 'price_min', 'price_max')
+FILTER_ARGS = PAGE_ARGS[1:]
+
+
+def encode_cursor(book):
+    """Encode the (created_at, id) position of a book as an opaque token"""
+    payload = json.dumps([book.created_at.isoformat(), str(book.id)])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token back into a (created_at, id) tuple"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, book_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(created_at, str) or not isinstance(book_id, str):
+            raise TypeError("Cursor fields must be strings")
+        return datetime.fromisoformat(created_at), uuid.UUID(book_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_int(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+
+
+def _related_filter(model, relation, value):
+    """Filter on a related author/genre given either its id or its name"""
+    try:
+        return getattr(Book, f'{relation}_id') == uuid.UUID(value)
+    except ValueError:
+        return getattr(Book, relation).has(model.name == value)
+
+
+def parse_filter_groups(args):
+    """SQL filters from request query arguments, by facet: genre, author, year and price"""
+    groups = {'genre': [], 'author': [], 'year': [], 'price': []}
+
+    genre = args.get('genre')
+    if genre:
+        groups['genre'].append(_related_filter(Genre, 'genre', genre))
+
+    author = args.get('author')
+    if author:
+        groups['author'].append(_related_filter(Author, 'author', author))
+
+    year_from = parse_int(args, 'year_from')
+    if year_from is not None:
+        groups['year'].append(Book.year >= year_from)
+
+    year_to = parse_int(args, 'year_to')
+    if year_to is not None:
+        groups['year'].append(Book.year <= year_to)
+
+    price_min = parse_int(args, 'price_min')
+    if price_min is not None:
+        groups['price'].append(Book.price >= price_min)
+
+    price_max = parse_int(args, 'price_max')
+    if price_max is not None:
+        groups['price'].append(Book.price <= price_max)
+
+    return groups
+
+
+def parse_filters(args):
+    """Build the list of SQL filters from request query arguments"""
+    return [condition for group in parse_filter_groups(args).values() for condition in group]
+
+
+def get_books_page(filters, cursor=None, limit=50):
+    """
+    Fetch one page of books ordered by (created_at, id).
+
+    Returns the books of the page and the cursor of the next page,
+    or None when this is the last page.
+    """
+    query = Book.query.options(*book_options()).filter(*filters)
+
+    if cursor:
+        created_at, book_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Book.created_at, Book.id) > tuple_(created_at, book_id))
+
+    # Fetch one extra row to know whether another page exists
+    books = query.order_by(Book.created_at, Book.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(books[-1])
+
+    return books, next_cursor
+
+
+def serialize_entry(data, **extra):
+    """
+    Encode data once into a cacheable response entry.
+
+    The entry holds the JSON 'body' and a strong 'etag' made of the catalog
+    version and a digest of the body, plus any extra fields.
+    """
+    body = current_app.json.dumps(data)
+    digest = hashlib.blake2b(body.encode('utf-8'), digest_size=8).hexdigest()
+    return dict(extra, body=body, etag=f'{catalog_cache.version()}-{digest}')
+
+
+def get_cached_books_page(args, limit):
+    """
+    One pre-serialized page of books, served from the catalog cache.
+
+    Returns an entry with the JSON 'body', its 'etag' and the 'next_cursor'.
+    """
+    params = sorted((name, args[name]) for name in PAGE_ARGS if args.get(name))
+    key = f'books:{limit}:{urlencode(params)}'
+
+    def load():
+        books, next_cursor = get_books_page(parse_filters(args), args.get('cursor'), limit)
+        return serialize_entry([book.to_dict() for book in books], next_cursor=next_cursor)
+
+    return catalog_cache.get(key, load)
+
+
+def get_cached_book(book_id):
+    """A pre-serialized book entry from the catalog cache, or None if it does not exist"""
+    try:
+        book_id = uuid.UUID(str(book_id))
+    except ValueError:
+        return None
+
+    def load():
+        book = Book.query.options(*book_options()).filter_by(id=book_id).first()
+        return serialize_entry(book.to_dict()) if book else None
+
+    return catalog_cache.get(f'book:{book_id}', load)
+
+
+def get_facets(args):
+    """
+    Book counts per genre, author, year bucket and price band, and in total.
+
+    Everything comes from one GROUPING SETS pass over books. Each facet is
+    counted with every filter in args except its own, so picking a genre
+    still shows how many books the other genres have.
+    """
+    config = current_app.config
+    groups = parse_filter_groups(args)
+    year_size = config['FACET_YEAR_BUCKET']
+    bounds = config['FACET_PRICE_BANDS']
+
+    def others(facet):
+        return and_(True, *(condition for name, group in groups.items() if name != facet for condition in group))
+
+    year = ((Book.year // year_size) * year_size).label('year_bucket')
+    band = case(*((Book.price < bound, number) for number, bound in enumerate(bounds)), else_=len(bounds)).label('price_band')
+    counts = (
+        select(
+            Book.genre_id,
+            Book.author_id,
+            year,
+            band,
+            func.count().filter(others('genre')).label('genre_count'),
+            func.count().filter(others('author')).label('author_count'),
+            func.count().filter(others('year')).label('year_count'),
+            func.count().filter(others('price')).label('price_count'),
+            func.count().filter(others(None)).label('total'),
+        )
+        # A book counts for some facet when it passes every filter but one facet's
+        .where(or_(*(others(facet) for facet, group in groups.items() if group)) if any(groups.values()) else True)
+        .group_by(func.grouping_sets(Book.genre_id, Book.author_id, year, band, text('()')))
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(counts, Genre.name.label('genre_name'), Author.name.label('author_name'))
+        .outerjoin(Genre, Genre.id == counts.c.genre_id)
+        .outerjoin(Author, Author.id == counts.c.author_id)
+    ).all()
+
+    facets = {'total': 0, 'genres': [], 'authors': [], 'years': [], 'prices': []}
+    for row in rows:
+        if row.genre_id is not None:
+            facets['genres'].append({'id': row.genre_id, 'name': row.genre_name, 'count': row.genre_count})
+        elif row.author_id is not None:
+            facets['authors'].append({'id': row.author_id, 'name': row.author_name, 'count': row.author_count})
+        elif row.year_bucket is not None:
+            facets['years'].append({'from': row.year_bucket, 'to': row.year_bucket + year_size - 1, 'count': row.year_count})
+        elif row.price_band is not None:
+            facets['prices'].append({
+                'min': bounds[row.price_band - 1] if row.price_band else 0,
+                'max': bounds[row.price_band] - 1 if row.price_band < len(bounds) else None,
+                'count': row.price_count,
+            })
+        else:
+            facets['total'] = row.total
+
+    limit = config['FACET_LIMIT']
+    for name in ('genres', 'authors'):
+        values = [value for value in facets[name] if value['count']]
+        facets[name] = sorted(values, key=lambda value: (-value['count'], value['name']))[:limit]
+    facets['years'] = sorted((value for value in facets['years'] if value['count']), key=lambda value: value['from'])
+    facets['prices'] = sorted((value for value in facets['prices'] if value['count']), key=lambda value: value['min'])
+    return facets
+
+
+def get_cached_facets(args):
+    """Pre-serialized facet counts for the filters in args, served from the catalog cache"""
+    params = sorted((name, args[name]) for name in FILTER_ARGS if args.get(name))
+
+    def load():
+        return serialize_entry(get_facets(args))
+
+    return catalog_cache.get(f'facets:{urlencode(params)}', load)
@@ -0,0 +1,186 @@
+# app/services/collection_service.py
+"""
+A user's cart and favorites.
+
+Both tables hold at most one row per (user_id, book_id), enforced by a unique
+index. Adding a book is a single INSERT ... ON CONFLICT DO NOTHING RETURNING:
+no row back means the book was already there, and a foreign key violation
+means the book does not exist. Concurrent double clicks therefore cannot
+create duplicates, and no lookups run before the insert.
+
+Batch changes work on sets of book ids: one DELETE for the removals, one
+INSERT ... SELECT FROM books for the additions (ids that are not books drop
+out there), and one SELECT for the resulting list, all in one transaction.
+
+Reads come in pages ordered by (created_at, id), or as just the book ids,
+which the unique index answers on its own.
+"""
+import uuid
+from collections import namedtuple
+from sqlalchemy import func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import Book
+from app.services.book_service import decode_cursor, encode_cursor
+
+FOREIGN_KEY_VIOLATION = '23503'
+
+
+class CollectionError(Exception):
+    """A cart or favorites request that cannot be honoured, with its HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def parse_book_id(value):
+    """UUID of a book id from a request, or CollectionError"""
+    if not value:
+        raise CollectionError("Book ID is required")
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise CollectionError("Book not found", 404)
+
+
+def parse_book_ids(values, limit):
+    """Distinct UUIDs of a list of book ids from a request, in order, or CollectionError"""
+    if values is None:
+        return []
+    if not isinstance(values, list):
+        raise CollectionError("Book IDs must be a list")
+    if len(values) > limit:
+        raise CollectionError(f"At most {limit} book IDs per request")
+    book_ids = []
+    for value in values:
+        try:
+            book_id = uuid.UUID(str(value))
+        except ValueError:
+            raise CollectionError(f"Invalid book ID: {value}")
+        if book_id not in book_ids:
+            book_ids.append(book_id)
+    return book_ids
+
+
+def add_item(model, user_id, book_id, options=None):
+    """
+    Add book_id to a user's cart or favorites (model).
+
+    Returns the new row, or None when the book was already there. options,
+    called with the entity to load (e.g. cart_options), loads related rows in
+    the same statement. The caller commits, after serializing the row so
+    that commit does not expire it.
+    """
+    inserted = (
+        insert(model)
+        .values(user_id=user_id, book_id=book_id)
+        .on_conflict_do_nothing(index_elements=['user_id', 'book_id'])
+        .returning(*model.__table__.c)
+        .cte('inserted')
+    )
+    row = aliased(model, inserted)
+    try:
+        # Rows a data-modifying CTE inserts are only visible through the CTE
+        return db.session.scalars(select(row).options(*(options(row) if options else ()))).first()
+    except IntegrityError as e:
+        db.session.rollback()
+        if getattr(e.orig, 'pgcode', None) == FOREIGN_KEY_VIOLATION:
+            raise CollectionError("Book not found", 404)
+        raise
+
+
+def get_items_page(model, user_id, cursor=None, limit=50, options=None):
+    """
+    One page of a user's cart or favorites (model), oldest first.
+
+    Returns the rows, loaded with options(), and the cursor of the next page,
+    or None when this is the last page.
+    """
+    query = select(model).where(model.user_id == user_id).options(*(options() if options else ()))
+
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        query = query.where(tuple_(model.created_at, model.id) > tuple_(created_at, item_id))
+
+    # Fetch one extra row to know whether another page exists
+    items = db.session.scalars(query.order_by(model.created_at, model.id).limit(limit + 1)).unique().all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1])
+
+    return items, next_cursor
+
+
+def get_book_ids(model, user_id):
+    """Ids of the books in a user's cart or favorites (model), from the unique index alone"""
+    table = model.__table__
+    return db.session.scalars(
+        select(table.c.book_id).where(table.c.user_id == user_id).order_by(table.c.book_id)
+    ).all()
+
+
+class BatchResult(namedtuple('BatchResult', 'items added removed not_found removals')):
+    """A user's cart or favorites after a batch change, and what changed; removals are (book_id, created_at) rows"""
+
+    def to_dict(self, key):
+        return {
+            key: [item.to_dict(with_book=True) for item in self.items],
+            'added': self.added,
+            'removed': self.removed,
+            'not_found': self.not_found,
+        }
+
+
+def change_items(model, user_id, add=(), remove=(), sync=False, options=None):
+    """
+    Add and remove books in a user's cart or favorites (model) in one go.
+
+    With sync, every book not in add is removed, leaving exactly add. Books
+    already there are left alone, and ids in add that are not books are
+    reported in not_found. Returns a BatchResult with the resulting list,
+    loaded with options(). The caller commits, after serializing it.
+    """
+    table = model.__table__
+    removals = []
+    if sync:
+        removals = db.session.execute(
+            table.delete()
+            .where(table.c.user_id == user_id, table.c.book_id.not_in(add))
+            .returning(table.c.book_id, table.c.created_at)
+        ).all()
+    elif remove:
+        removals = db.session.execute(
+            table.delete()
+            .where(table.c.user_id == user_id, table.c.book_id.in_(remove))
+            .returning(table.c.book_id, table.c.created_at)
+        ).all()
+    removed = [book_id for book_id, _ in removals]
+
+    added = []
+    if add:
+        now = func.timezone('utc', func.now())
+        rows = select(
+            func.gen_random_uuid(), literal(user_id, table.c.user_id.type), Book.id, now, now
+        ).where(Book.id.in_(add))
+        added = db.session.scalars(
+            insert(table)
+            .from_select(['id', 'user_id', 'book_id', 'created_at', 'updated_at'], rows)
+            .on_conflict_do_nothing(index_elements=['user_id', 'book_id'])
+            .returning(table.c.book_id)
+        ).all()
+
+    items = db.session.scalars(
+        select(model)
+        .where(model.user_id == user_id)
+        .options(*(options() if options else ()))
+        .order_by(model.created_at, model.id)
+    ).unique().all()
+    present = {item.book_id for item in items}
+    not_found = [book_id for book_id in add if book_id not in present]
+    return BatchResult(items, added, removed, not_found, [tuple(row) for row in removals])
@@ -0,0 +1,228 @@
+# app/services/cover_service.py
+"""
+Resized cover derivatives.
+
+Covers are resized once per (source, width, format) on a small thread pool
+and kept on disk under COVER_CACHE_DIR (uploads/derivatives by default),
+sharded like the asset store. The derivative cache is bounded by
+COVER_CACHE_MAX_BYTES: once it grows past it, the least recently used
+derivatives are removed.
+
+Pillow is optional; without it the original cover is served.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from app import db, catalog_cache
+from app.models import Book
+from app.utils.asset_store import is_content_addressed
+from app.utils.file_delivery import resolve_upload
+
+try:
+    from PIL import Image
+    # Unreadable and oversized (decompression bomb) covers
+    COVER_ERRORS = (OSError, Image.DecompressionBombError)
+except ImportError:  # pragma: no cover - depends on the environment
+    Image = None
+    COVER_ERRORS = (OSError,)
+
+COVER_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+# Only refresh the access time of a derivative this often
+TOUCH_INTERVAL = 3600
+
+_executor = None
+_in_flight = {}
+_lock = threading.Lock()
+_size_lock = threading.Lock()
+_cache_size = None
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['COVER_WORKERS'],
+                thread_name_prefix='cover'
+            )
+        return _executor
+
+
+def derivatives_directory(app=None):
+    app = app or current_app
+    return app.config['COVER_CACHE_DIR'] or os.path.join(app.static_folder, 'uploads', 'derivatives')
+
+
+def _derivative_path(source_path, image_name, width, fmt):
+    """Path of a derivative, keyed by the identity of its source"""
+    if is_content_addressed(image_name):
+        source = image_name
+    else:
+        stat = os.stat(source_path)
+        source = f'{image_name}:{stat.st_mtime_ns}:{stat.st_size}'
+    key = hashlib.sha256(f'{source}:{width}:{fmt}'.encode('utf-8')).hexdigest()
+    return os.path.join(derivatives_directory(), key[:2], key[2:4], f'{key}.{fmt}')
+
+
+def render_cover(source_path, target_path, width, fmt, quality):
+    """Resize a cover to width (never upscaling) and write it atomically"""
+    pil_format = COVER_FORMATS[fmt][0]
+    with Image.open(source_path) as image:
+        image.draft('RGB', (width, width * 4))
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if pil_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        directory = os.path.dirname(target_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, pil_format, quality=quality)
+            os.replace(temp_path, target_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    return os.path.getsize(target_path)
+
+
+def _track_size(added, app):
+    """Account for a new derivative and evict old ones past the size limit"""
+    global _cache_size
+    limit = app.config['COVER_CACHE_MAX_BYTES']
+    with _size_lock:
+        if _cache_size is None:
+            _cache_size = sum(size for _, size, _ in _scan(app))
+        else:
+            _cache_size += added
+        if _cache_size <= limit:
+            return
+
+        # Drop least recently used derivatives down to 90% of the limit
+        entries = sorted(_scan(app), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= limit * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        _cache_size = total
+
+
+def _scan(app):
+    for directory, _, files in os.walk(derivatives_directory(app)):
+        for name in files:
+            if name.endswith('.part'):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+
+def get_cover_name(book_id):
+    """
+    Cover file name of a book from the catalog cache.
+
+    Returns None if the book does not exist and '' if it has no cover.
+    """
+    try:
+        book_id = uuid.UUID(str(book_id))
+    except ValueError:
+        return None
+
+    def load():
+        image = db.session.execute(db.select(Book.image).filter_by(id=book_id)).first()
+        return {'image': image[0] or ''} if image else None
+
+    entry = catalog_cache.get(f'cover:{book_id}', load)
+    return entry['image'] if entry else None
+
+
+def get_cover(image_name, width, fmt):
+    """
+    Path of the cover of a book at the given width and format.
+
+    Returns the original cover when Pillow is not installed, and None when
+    the book has no cover file.
+    """
+    uploads_dir = os.path.join(current_app.static_folder, 'uploads')
+    source_path = resolve_upload(uploads_dir, image_name)
+    if source_path is None:
+        return None
+    if Image is None:
+        return source_path
+
+    target_path = _derivative_path(source_path, image_name, width, fmt)
+    try:
+        stat = os.stat(target_path)
+        # Record the access for LRU eviction, without a write per request
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+            os.utime(target_path)
+        return target_path
+    except FileNotFoundError:
+        pass
+
+    # Concurrent requests for the same derivative share one render
+    executor = _get_executor()
+    with _lock:
+        future = _in_flight.get(target_path)
+        if future is None:
+            app = current_app._get_current_object()
+            future = executor.submit(
+                _render_job, app, source_path, target_path, width, fmt
+            )
+            _in_flight[target_path] = future
+    try:
+        future.result()
+    except COVER_ERRORS:
+        # Not an image we can resize; serve the file as it is
+        return source_path
+    return target_path
+
+
+def _render_job(app, source_path, target_path, width, fmt):
+    try:
+        added = render_cover(source_path, target_path, width, fmt, app.config['COVER_QUALITY'])
+        _track_size(added, app)
+    finally:
+        with _lock:
+            _in_flight.pop(target_path, None)
+
+
+def pregenerate_covers(image_names, widths, formats):
+    """
+    Render every missing derivative of the given covers in parallel.
+
+    Yields (image name, error or None) as each cover finishes.
+    """
+    app = current_app._get_current_object()
+
+    def generate(image_name):
+        with app.app_context():
+            for width in widths:
+                for fmt in formats:
+                    get_cover(image_name, width, fmt)
+
+    with ThreadPoolExecutor(max_workers=app.config['COVER_WORKERS']) as pool:
+        futures = {pool.submit(generate, name): name for name in image_names}
+        for future in as_completed(futures):
+            yield futures[future], future.exception()
@@ -0,0 +1,154 @@
+# app/services/recommendation_service.py
+"""
+"Readers also liked": books similar to a book by who keeps them.
+
+`flask recs build` reads every favorite and cart row (weighted by
+RECS_WEIGHTS; users holding more than RECS_MAX_USER_ITEMS books are left
+out), computes item-item cosine similarity (see app/utils/similarity.py) and
+stores each book's top RECS_NEIGHBORS in book_similarities. Serving a book's
+list is then one primary key range scan.
+
+A build picks up from the last one. When rows were only added since, just
+the books sharing a user with a changed book are recomputed, since no other
+scores can have moved. Each build stores a checksum of the rows it read; when
+the rows up to its watermark no longer add up to it (a row was removed, or
+one committed late with an older created_at), or with --full, everything is
+recomputed.
+"""
+import hashlib
+import time
+import uuid
+from array import array
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select, union_all
+from app import db, catalog_cache
+from app.models import Book, BookSimilarity, Cart, Favorite, SimilarityBuild
+from app.models.loading import book_options
+from app.services.book_service import serialize_entry
+from app.utils.similarity import cooccurring, engine, top_neighbors
+
+WRITE_BATCH_SIZE = 5000
+READ_BATCH_SIZE = 50000
+# Checksums are kept in a signed 64-bit column
+CHECKSUM_MODULUS = 2 ** 63
+
+
+def _interactions():
+    """(user_id, book_id, weight, created_at) of every favorite and cart row that counts"""
+    config = current_app.config
+    weights = config['RECS_WEIGHTS']
+    events = union_all(
+        select(Favorite.user_id, Favorite.book_id, Favorite.created_at, literal(weights['favorite']).label('weight')),
+        select(Cart.user_id, Cart.book_id, Cart.created_at, literal(weights['cart']).label('weight')),
+    ).cte('events')
+    # Collectors and bots pair everything with everything; their rows cost most and say least
+    heavy = select(events.c.user_id).group_by(events.c.user_id).having(func.count() > config['RECS_MAX_USER_ITEMS'])
+    query = select(events.c.user_id, events.c.book_id, events.c.weight, events.c.created_at).where(
+        events.c.user_id.not_in(heavy)
+    )
+    return db.session.execute(query.execution_options(yield_per=READ_BATCH_SIZE))
+
+
+def _row_hash(user_id, book_id, weight):
+    digest = hashlib.blake2b(f'{user_id} {book_id} {weight}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def build_similarities(full=False):
+    """Recompute book neighbors, incrementally when possible; returns a summary of the build"""
+    config = current_app.config
+    started = time.perf_counter()
+    last = db.session.scalars(select(SimilarityBuild).order_by(SimilarityBuild.id.desc()).limit(1)).first()
+    since = last.watermark if last is not None and not full else None
+
+    # Books and users as dense indexes; compact arrays keep millions of rows small
+    user_index, book_index, book_ids = {}, {}, []
+    users, items, weights = array('q'), array('q'), array('d')
+    changed, checksum, old_checksum, watermark = set(), 0, 0, None
+    for user_id, book_id, weight, created_at in _interactions():
+        item = book_index.get(book_id)
+        if item is None:
+            item = book_index[book_id] = len(book_ids)
+            book_ids.append(book_id)
+        users.append(user_index.setdefault(user_id, len(user_index)))
+        items.append(item)
+        weights.append(weight)
+        # A sum, so the order rows come in does not matter
+        row_hash = _row_hash(user_id, book_id, weight)
+        checksum = (checksum + row_hash) % CHECKSUM_MODULUS
+        if created_at is not None:
+            watermark = created_at if watermark is None or created_at > watermark else watermark
+        if since is not None and created_at is not None and created_at > since:
+            changed.add(item)
+        else:
+            old_checksum = (old_checksum + row_hash) % CHECKSUM_MODULUS
+
+    # The rows up to the last watermark are exactly those the last build read
+    incremental = since is not None and last.checksum is not None and old_checksum == last.checksum
+    if incremental:
+        rows = sorted(cooccurring(users, items, changed)) if changed else []
+    else:
+        rows = range(len(book_ids))
+
+    if incremental:
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            stale = [book_ids[item] for item in rows[start:start + WRITE_BATCH_SIZE]]
+            db.session.execute(delete(BookSimilarity).where(BookSimilarity.book_id.in_(stale)))
+    else:
+        db.session.execute(delete(BookSimilarity))
+
+    pairs, batch = 0, []
+    neighbors = top_neighbors(
+        users, items, weights, len(book_ids), rows, config['RECS_NEIGHBORS'], block_size=config['RECS_BLOCK_SIZE']
+    )
+    for item, scored in neighbors:
+        batch.extend(
+            {'book_id': book_ids[item], 'rank': rank, 'similar_book_id': book_ids[other], 'score': score}
+            for rank, (other, score) in enumerate(scored)
+        )
+        if len(batch) >= WRITE_BATCH_SIZE:
+            db.session.execute(insert(BookSimilarity), batch)
+            pairs += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(BookSimilarity), batch)
+        pairs += len(batch)
+
+    build = SimilarityBuild(
+        finished_at=datetime.utcnow(),
+        watermark=watermark,
+        interactions=len(items),
+        checksum=checksum,
+        books=len(rows),
+        pairs=pairs,
+        full=not incremental,
+        seconds=round(time.perf_counter() - started, 3),
+    )
+    db.session.add(build)
+    db.session.commit()
+    if rows:
+        catalog_cache.invalidate()
+    return dict(build.to_dict(), engine=engine())
+
+
+def get_cached_similar(book_id, limit):
+    """Pre-serialized books most like book_id, best first, or None if the book does not exist"""
+    try:
+        book_id = uuid.UUID(str(book_id))
+    except ValueError:
+        return None
+
+    def load():
+        books = (
+            Book.query.options(*book_options())
+            .join(BookSimilarity, BookSimilarity.similar_book_id == Book.id)
+            .filter(BookSimilarity.book_id == book_id, BookSimilarity.rank < limit)
+            .order_by(BookSimilarity.rank)
+            .all()
+        )
+        if not books and db.session.scalar(select(Book.id).where(Book.id == book_id)) is None:
+            return None
+        return serialize_entry([book.to_dict() for book in books])
+
+    return catalog_cache.get(f'similar:{limit}:{book_id}', load)
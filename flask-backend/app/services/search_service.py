@@ -0,0 +1,141 @@
+# app/services/search_service.py
+"""
+Catalog search by title and author name.
+
+On PostgreSQL, books.search_document is matched with full-text search (every
+query word as a prefix) through its GIN index, and, when the pg_trgm index
+from the migrations exists, by trigram word similarity too, which catches
+typos. Results are ranked by ts_rank plus the trigram similarity, with titles
+that start with the query first.
+
+Other databases, or SEARCH_BACKEND=memory, use an InvertedIndex built per
+worker from the catalog. It is rebuilt when the catalog version changes, and
+at least every SEARCH_INDEX_MAX_AGE seconds, since without Redis a worker does
+not see the other workers' changes.
+
+Either way the serialized results are kept in the catalog cache.
+"""
+import threading
+import time
+from flask import current_app
+from sqlalchemy import case, func, literal, literal_column, select, text
+from app import db, catalog_cache
+from app.models import Author, Book
+from app.models.book import SEARCH_VECTOR
+from app.models.loading import book_options
+from app.services.book_service import serialize_entry
+from app.utils.text_search import InvertedIndex, tokenize
+
+TRIGRAM_INDEX = 'ix_books_search_trgm'
+
+_lock = threading.Lock()
+# Per engine URL: whether the trigram index exists
+_trigram = {}
+
+
+class _IndexState:
+    """This worker's InvertedIndex for one app, and when it was built"""
+
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.built_at = 0.0
+        self.builds = 0
+        self.build_seconds = 0.0
+
+
+def _state():
+    return current_app.extensions.setdefault('search_index', _IndexState())
+
+
+def search_backend():
+    """'database' or 'memory', from SEARCH_BACKEND and the database in use"""
+    backend = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = 'database' if db.engine.dialect.name == 'postgresql' else 'memory'
+    return backend
+
+
+def _has_trigram_index():
+    url = str(db.engine.url)
+    if url not in _trigram:
+        _trigram[url] = db.session.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {'name': TRIGRAM_INDEX}
+        ).first() is not None
+    return _trigram[url]
+
+
+def _database_search(tokens, limit):
+    phrase = ' '.join(tokens)
+    # Words are \w+ only, so they cannot carry tsquery operators
+    query = func.to_tsquery(literal_column("'simple'::regconfig"), ' & '.join(f'{token}:*' for token in tokens))
+    match = SEARCH_VECTOR.op('@@')(query)
+    rank = func.ts_rank(SEARCH_VECTOR, query)
+    if _has_trigram_index():
+        match = match | literal(phrase).op('<%')(Book.search_document)
+        rank = rank + func.word_similarity(phrase, Book.search_document)
+    starts = case((Book.search_document.startswith(phrase, autoescape=True), 1), else_=0)
+
+    return db.session.scalars(
+        select(Book.id).where(match).order_by(starts.desc(), rank.desc(), Book.title, Book.id).limit(limit)
+    ).all()
+
+
+def _memory_index():
+    state = _state()
+    version = catalog_cache.version()
+    max_age = current_app.config.get('SEARCH_INDEX_MAX_AGE', 60)
+    with _lock:
+        if state.index is not None and state.version == version and time.monotonic() - state.built_at < max_age:
+            return state.index
+
+        started = time.perf_counter()
+        rows = db.session.execute(select(Book.id, Book.title, Author.name).join(Book.author))
+        state.index = InvertedIndex(rows)
+        # A replica may not have the change yet; then the next search rebuilds
+        state.version = version if catalog_cache.settled() else None
+        state.built_at = time.monotonic()
+        state.builds += 1
+        state.build_seconds = round(time.perf_counter() - started, 3)
+        return state.index
+
+
+def search_book_ids(query, limit=20):
+    """Ids of the books best matching query, best first"""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    if search_backend() == 'database':
+        return _database_search(tokens, limit)
+    return _memory_index().search(query, limit)
+
+
+def get_cached_search(query, limit):
+    """One pre-serialized list of matching books, served from the catalog cache"""
+    tokens = tokenize(query)
+    key = f"search:{limit}:{' '.join(tokens)}"
+
+    def load():
+        book_ids = search_book_ids(query, limit)
+        books = {book.id: book for book in Book.query.options(*book_options()).filter(Book.id.in_(book_ids))}
+        return serialize_entry([books[book_id].to_dict() for book_id in book_ids if book_id in books])
+
+    return catalog_cache.get(key, load)
+
+
+def search_stats():
+    """Search backend and, when built, the size of this worker's index"""
+    stats = {'backend': search_backend()}
+    if stats['backend'] == 'database':
+        stats['trigram'] = _has_trigram_index()
+    state = _state()
+    with _lock:
+        if state.index is not None:
+            stats.update(
+                books=len(state.index),
+                words=len(state.index.words),
+                version=state.version,
+                builds=state.builds,
+                build_seconds=state.build_seconds,
+            )
+    return stats
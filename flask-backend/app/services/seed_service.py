@@ -0,0 +1,208 @@
+# app/services/seed_service.py
+"""
+Bulk catalog import.
+
+Existing genres, authors and book titles are loaded with one query per table,
+and only missing rows are written, in batches of SEED_BATCH_SIZE. Large
+batches go through COPY on PostgreSQL; smaller ones (and other databases) use
+INSERT ... ON CONFLICT DO NOTHING. Books are deduplicated by title, authors
+and genres by name, as before.
+"""
+import csv
+import io
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db, catalog_cache, asset_store
+from app.models import Asset, Author, Book, Genre
+from app.utils.asset_store import is_content_addressed
+from app.utils.book_utils import ensure_upload_directories
+from app.utils.text_search import search_document
+from app.data.books_data import GENRE_DATA, AUTHOR_DATA, BOOKS_DATA
+
+REQUIRED_FIELDS = ('title', 'author', 'genre', 'year', 'price')
+
+
+def default_records():
+    """Books bundled with the app, in the format read_records() yields"""
+    return iter(BOOKS_DATA)
+
+
+def read_records(path):
+    """Yield book records from a CSV (with a header row) or JSON Lines file"""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if ext == '.csv':
+            yield from csv.DictReader(f)
+        elif ext in ('.jsonl', '.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported seed file type: {ext or 'none'} (use .csv or .jsonl)")
+
+
+def _normalize(record, number):
+    """Validate a record and map it onto book columns"""
+    missing = [name for name in REQUIRED_FIELDS if record.get(name) in (None, '')]
+    if missing:
+        raise ValueError(f"Record {number}: missing {', '.join(missing)}")
+    try:
+        year = int(record['year'])
+        price = int(record['price'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Record {number}: 'year' and 'price' must be integers")
+    return {
+        'title': str(record['title']).strip(),
+        'author': str(record['author']).strip(),
+        'genre': str(record['genre']).strip(),
+        'year': year,
+        'price': price,
+        'image': record.get('image') or '',
+        'pdf': record.get('pdf') or record.get('bookUrl') or '',
+    }
+
+
+def _insert_statement(table):
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(table).on_conflict_do_nothing()
+
+
+def _copy_rows(table, rows):
+    """Load rows with COPY inside the session's transaction"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    # Strings are quoted so empty strings stay distinct from NULL
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _bulk_insert(model, rows):
+    if not rows:
+        return
+    table = model.__table__
+    copy_min_rows = current_app.config['SEED_COPY_MIN_ROWS']
+    if db.engine.dialect.name == 'postgresql' and len(rows) >= copy_min_rows:
+        _copy_rows(table, rows)
+    else:
+        db.session.execute(_insert_statement(table), rows)
+
+
+def _existing_files():
+    """Names of every stored cover and PDF, from one scan per folder"""
+    uploads_dir = ensure_upload_directories()
+    names = set()
+    for directory in (uploads_dir, os.path.join(uploads_dir, 'books')):
+        if os.path.isdir(directory):
+            names.update(entry.name for entry in os.scandir(directory) if entry.is_file())
+    names.update(db.session.scalars(select(Asset.name)))
+    return names
+
+
+def seed_catalog(records, genres=(), authors=(), batch_size=None):
+    """
+    Insert the books in records that are not in the database yet.
+
+    Genres and authors named by the books (or listed in genres/authors) are
+    created as needed. Everything is committed in one transaction. Returns a
+    summary with row counts, books whose files are missing and the rate.
+    """
+    started = time.perf_counter()
+    batch_size = batch_size or current_app.config['SEED_BATCH_SIZE']
+
+    known = {
+        Genre: dict(db.session.execute(select(Genre.name, Genre.id)).all()),
+        Author: dict(db.session.execute(select(Author.name, Author.id)).all()),
+    }
+    titles = set(db.session.scalars(select(Book.title)))
+    files = _existing_files()
+
+    summary = {'genres': 0, 'authors': 0, 'books': 0, 'skipped': 0, 'missing_files': 0}
+    pending = {Genre: [], Author: [], Book: []}
+    now = datetime.utcnow()
+    stored_assets = False
+
+    def key_for(model, name):
+        """Id of a genre or author, queueing it for insertion if it is new"""
+        row_id = known[model].get(name)
+        if row_id is None:
+            row_id = known[model][name] = uuid.uuid4()
+            pending[model].append({'id': row_id, 'name': name, 'created_at': now, 'updated_at': now})
+            summary['genres' if model is Genre else 'authors'] += 1
+        return row_id
+
+    def flush():
+        # Parents first, for the foreign keys
+        for model in (Genre, Author, Book):
+            _bulk_insert(model, pending[model])
+            pending[model] = []
+
+    for item in genres:
+        key_for(Genre, item['name'])
+    for item in authors:
+        key_for(Author, item['name'])
+
+    for number, record in enumerate(records, start=1):
+        book = _normalize(record, number)
+        if book['title'] in titles:
+            summary['skipped'] += 1
+            continue
+        titles.add(book['title'])
+
+        if (book['image'] and book['image'] not in files) or (book['pdf'] and book['pdf'] not in files):
+            summary['missing_files'] += 1
+        stored_assets = stored_assets or is_content_addressed(book['image']) or is_content_addressed(book['pdf'])
+
+        # Keep the input order for the (created_at, id) pagination
+        created_at = now + timedelta(microseconds=summary['books'])
+        pending[Book].append({
+            'id': uuid.uuid4(),
+            'title': book['title'],
+            'year': book['year'],
+            'image': book['image'],
+            'pdf': book['pdf'],
+            'price': book['price'],
+            'author_id': key_for(Author, book['author']),
+            'genre_id': key_for(Genre, book['genre']),
+            # Bulk inserts skip the Book events that fill this in
+            'search_document': search_document(book['title'], book['author']),
+            'created_at': created_at,
+            'updated_at': created_at,
+        })
+        summary['books'] += 1
+        if len(pending[Book]) >= batch_size:
+            flush()
+
+    flush()
+    # Bulk inserts bypass the ORM events that keep counts and caches current
+    if stored_assets:
+        asset_store.recount()
+    db.session.commit()
+    if summary['genres'] or summary['authors'] or summary['books']:
+        catalog_cache.invalidate()
+
+    elapsed = time.perf_counter() - started
+    rows = summary['genres'] + summary['authors'] + summary['books']
+    summary['seconds'] = round(elapsed, 3)
+    summary['rows_per_second'] = round(rows / elapsed) if elapsed > 0 else rows
+    return summary
+
+
+def seed_default_catalog():
+    """Seed the genres, authors and books bundled with the app"""
+    return seed_catalog(default_records(), genres=GENRE_DATA, authors=AUTHOR_DATA)
@@ -0,0 +1,163 @@
+# app/services/suggest_service.py
+"""
+Search-as-you-type suggestions from a per-worker PrefixIndex.
+
+The index holds book titles and author names, scored by how many carts and
+favorites hold the book (or the author's books). It is built at startup when
+SUGGEST_PRELOAD is set, otherwise on first use. When the catalog version
+changes, or every SUGGEST_REFRESH_INTERVAL seconds, the request that notices
+reads only the books and authors updated since the last look and applies
+them, while other requests keep using the current index. Deleted rows are
+found by comparing the index with the ids still in the tables. A live row the
+index lacks, too many replaced entries, or SUGGEST_REBUILD_INTERVAL seconds,
+which also refreshes the scores, trigger a full rebuild.
+"""
+import threading
+import time
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func, select, union_all
+from app import db, catalog_cache
+from app.models import Author, Book, Cart, Favorite
+from app.utils.text_search import PrefixIndex
+
+# Rows updated this long before the newest one seen are read again, in case
+# they were committed late
+WATERMARK_MARGIN = timedelta(seconds=60)
+
+
+class _SuggestState:
+    """This worker's PrefixIndex for one app, and what it was built from"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+        self.watermark = None
+        self.checked_at = 0.0
+        self.built_at = 0.0
+        self.builds = 0
+        self.updates = 0
+        self.build_seconds = 0.0
+
+
+def _state(app):
+    return app.extensions.setdefault('suggest_index', _SuggestState())
+
+
+def _scores(column, ids=None):
+    """{id: carts + favorites} of books, or of authors' books, by column"""
+    holders = union_all(select(Favorite.book_id), select(Cart.book_id)).subquery()
+    query = select(column, func.count()).select_from(holders).join(Book, Book.id == holders.c.book_id).group_by(column)
+    if ids is not None:
+        query = query.where(column.in_(ids))
+    return dict(db.session.execute(query).all())
+
+
+def _items(since=None):
+    """Index items of the books and authors updated after since (all when None), and the newest update time"""
+    books = select(Book.id, Book.title, Book.updated_at)
+    authors = select(Author.id, Author.name, Author.updated_at)
+    if since is not None:
+        books = books.where(Book.updated_at > since)
+        authors = authors.where(Author.updated_at > since)
+    books = db.session.execute(books).all()
+    authors = db.session.execute(authors).all()
+
+    book_scores = _scores(Book.id, None if since is None else [row.id for row in books]) if books else {}
+    author_scores = _scores(Book.author_id, None if since is None else [row.id for row in authors]) if authors else {}
+    items = [('book', row.id, row.title, book_scores.get(row.id, 0)) for row in books]
+    items += [('author', row.id, row.name, author_scores.get(row.id, 0)) for row in authors]
+    newest = max((row.updated_at for row in (*books, *authors) if row.updated_at), default=None)
+    return items, newest
+
+
+def _build(state, version):
+    config = current_app.config
+    started = time.perf_counter()
+    items, newest = _items()
+    state.index = PrefixIndex(items, k=config['SUGGEST_MAX_LIMIT'], short_prefix=config['SUGGEST_PREFIX_LENGTH'])
+    state.watermark = newest
+    state.version = version
+    state.checked_at = state.built_at = time.monotonic()
+    state.builds += 1
+    state.build_seconds = round(time.perf_counter() - started, 3)
+
+
+def _refresh(state, version):
+    since = state.watermark - WATERMARK_MARGIN if state.watermark else None
+    items, newest = _items(since)
+    # Counts alone miss a deletion and an insert in the same window
+    live = {('book', book_id) for book_id in db.session.scalars(select(Book.id))}
+    live.update(('author', author_id) for author_id in db.session.scalars(select(Author.id)))
+    index = state.index.updated(items, removed=[key for key in state.index.live if key not in live])
+    if index.live.keys() != live or index.dead > len(index) // 4:
+        _build(state, version)
+        return
+    state.index = index
+    state.watermark = max(filter(None, (state.watermark, newest)), default=None)
+    state.version = version
+    state.checked_at = time.monotonic()
+    state.updates += 1
+
+
+def get_suggest_index():
+    """This worker's index, brought up to date first if the catalog changed"""
+    config = current_app.config
+    state = _state(current_app)
+    version = catalog_cache.version()
+    now = time.monotonic()
+
+    if state.index is None:
+        with state.lock:
+            if state.index is None:
+                _build(state, version)
+        return state.index
+
+    stale = state.version != version or now - state.checked_at >= config['SUGGEST_REFRESH_INTERVAL']
+    # One thread updates while the others keep using the current index
+    if stale and state.lock.acquire(blocking=False):
+        try:
+            if now - state.built_at >= config['SUGGEST_REBUILD_INTERVAL']:
+                _build(state, version)
+            else:
+                _refresh(state, version)
+        finally:
+            state.lock.release()
+    return state.index
+
+
+def suggest(prefix, limit):
+    """Suggestions for prefix, as dicts with type, id and text"""
+    return [
+        {'type': kind, 'id': item_id, 'text': text}
+        for kind, item_id, text, _ in get_suggest_index().suggest(prefix, limit)
+    ]
+
+
+def preload_suggest_index(app):
+    """Build the index at startup, so the first keystrokes do not wait for it"""
+    with app.app_context():
+        state = _state(app)
+        with state.lock:
+            _build(state, catalog_cache.version())
+        db.session.remove()
+
+
+def suggest_stats(app):
+    """Size, memory use and build counters of this worker's index"""
+    state = _state(app)
+    index = state.index
+    if index is None:
+        return {'built': False}
+    return {
+        'built': True,
+        'items': len(index),
+        'keys': len(index.keys),
+        'dead': index.dead,
+        'memory_bytes': index.memory_bytes(),
+        'version': state.version,
+        'builds': state.builds,
+        'updates': state.updates,
+        'build_seconds': state.build_seconds,
+    }
@@ -0,0 +1,144 @@
+# app/services/trending_service.py
+"""
+Trending books: the SQL rollup of popularity scores and the top-N list.
+
+The rollup sums the decayed weight of every favorite and cart row per book
+(see app/utils/trending.py). With Redis, one worker per
+TRENDING_ROLLUP_INTERVAL publishes it as the new sorted set, and adds and
+removals move the scores in between. Without Redis, each worker keeps the
+top of its own rollup, which then runs every TRENDING_ROLLUP_INTERVAL.
+
+Each worker keeps the serialized top TRENDING_SIZE books and rebuilds them
+every TRENDING_REFRESH_INTERVAL seconds or when the catalog changes; the
+request that notices does it while the others keep serving the current list.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import Float, cast, func, literal, select, union_all
+from app import db, catalog_cache, trending
+from app.models import Book, Cart, Favorite
+from app.models.loading import book_options
+from app.services.book_service import serialize_entry
+
+
+class _TrendingState:
+    """This worker's top list for one app"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entry = None
+        self.version = None
+        self.refreshed_at = 0.0
+        # Without Redis: [(book_id, score)] from the last rollup here
+        self.scores = None
+        self.rolled_up_at = 0.0
+        self.rollups = 0
+        self.rollup_seconds = 0.0
+        self.source = None
+
+
+def _state(app):
+    return app.extensions.setdefault('trending_list', _TrendingState())
+
+
+def rollup_scores(epoch, limit=None):
+    """{book_id: score} relative to epoch from the favorites and cart tables, highest first"""
+    weights = current_app.config['TRENDING_WEIGHTS']
+    half_life = current_app.config['TRENDING_HALF_LIFE']
+    events = union_all(
+        select(Favorite.book_id, Favorite.created_at, literal(weights['favorite']).label('weight')),
+        select(Cart.book_id, Cart.created_at, literal(weights['cart']).label('weight')),
+    ).subquery()
+    # created_at is naive UTC
+    origin = datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
+    half_lives = cast(func.extract('epoch', events.c.created_at - origin), Float) / half_life
+    # Clamped: a double underflows, and PostgreSQL raises, below 2 ** -1022
+    score = func.sum(events.c.weight * func.power(2.0, func.greatest(half_lives, -1000))).label('score')
+    query = select(events.c.book_id, score).group_by(events.c.book_id).order_by(score.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return {book_id: float(value) for book_id, value in db.session.execute(query)}
+
+
+def run_rollup(state=None):
+    """Recompute the scores from the tables; publishes them to Redis when it is reachable"""
+    state = state or _state(current_app)
+    started = time.perf_counter()
+    epoch = time.time()
+    if trending.redis_available():
+        published = trending.publish(epoch, rollup_scores(epoch))
+    else:
+        published = False
+    if not published:
+        size = current_app.config['TRENDING_SIZE']
+        state.scores = list(rollup_scores(epoch, limit=size).items())
+    state.rolled_up_at = time.monotonic()
+    state.rollups += 1
+    state.rollup_seconds = round(time.perf_counter() - started, 3)
+    return published
+
+
+def _top_books(state):
+    config = current_app.config
+    size = config['TRENDING_SIZE']
+    now = time.monotonic()
+
+    top = trending.top(size)
+    epoch = trending.epoch
+    due = epoch is None or time.time() - epoch >= config['TRENDING_ROLLUP_INTERVAL']
+    # One worker per interval publishes a fresh set
+    if due and trending.redis_available() and trending.claim_rollup(time.time()):
+        run_rollup(state)
+        top = trending.top(size)
+
+    if top is not None:
+        state.source = 'redis'
+        return top
+    if state.scores is None or now - state.rolled_up_at >= config['TRENDING_ROLLUP_INTERVAL']:
+        run_rollup(state)
+    state.source = 'sql'
+    return state.scores or []
+
+
+def _refresh(state, version):
+    top = _top_books(state)
+    book_ids = [book_id for book_id, _ in top]
+    books = {book.id: book for book in Book.query.options(*book_options()).filter(Book.id.in_(book_ids))}
+    state.entry = serialize_entry([books[book_id].to_dict() for book_id in book_ids if book_id in books])
+    # A replica may not have the change yet; then the next request refreshes again
+    state.version = version if catalog_cache.settled() else None
+    state.refreshed_at = time.monotonic()
+
+
+def get_trending_entry():
+    """The pre-serialized trending list, refreshed first if it is stale"""
+    state = _state(current_app)
+    version = catalog_cache.version()
+
+    if state.entry is None:
+        with state.lock:
+            if state.entry is None:
+                _refresh(state, version)
+        return state.entry
+
+    stale = state.version != version or time.monotonic() - state.refreshed_at >= current_app.config['TRENDING_REFRESH_INTERVAL']
+    # One thread refreshes while the others keep serving the current list
+    if stale and state.lock.acquire(blocking=False):
+        try:
+            _refresh(state, version)
+        finally:
+            state.lock.release()
+    return state.entry
+
+
+def trending_stats(app):
+    """Counter and rollup state of trending"""
+    state = _state(app)
+    return dict(
+        trending.stats(),
+        source=state.source,
+        rollups=state.rollups,
+        rollup_seconds=state.rollup_seconds,
+    )
@@ -0,0 +1,192 @@
+# app/services/upload_service.py
+"""
+Resumable chunked uploads for large book files.
+
+An upload session is a partial file plus a small JSON metadata file in the
+'.incoming' directory of the uploads folder, so any worker can accept the
+next chunk. The number of bytes received so far is the size of the partial
+file; a client that lost its connection asks for it and resumes from there.
+Completed uploads are moved into the content-addressed asset store.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from flask import current_app
+from app.utils.book_utils import (
+    UPLOAD_EXTENSIONS, UploadTooLarge, ensure_upload_directories, write_stream
+)
+
+# Running SHA-256 of uploads whose chunks reached this worker in order,
+# so completing them does not need to read the file again
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """An upload request that cannot be honoured, with its HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class _NullHasher:
+    """Stand-in used when the running hash of an upload is not available"""
+
+    def update(self, data):
+        pass
+
+
+def _incoming_directory():
+    path = os.path.join(ensure_upload_directories(), '.incoming')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(upload_id):
+    try:
+        upload_id = uuid.UUID(upload_id).hex
+    except ValueError:
+        raise UploadError("Upload not found", 404)
+    directory = _incoming_directory()
+    return os.path.join(directory, f'{upload_id}.part'), os.path.join(directory, f'{upload_id}.json')
+
+
+def _state(upload_id, meta, part_path):
+    return dict(meta, id=upload_id, offset=os.path.getsize(part_path),
+                chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'])
+
+
+def purge_stale_uploads():
+    """Remove upload sessions untouched for longer than UPLOAD_SESSION_TTL"""
+    directory = _incoming_directory()
+    cutoff = time.time() - current_app.config['UPLOAD_SESSION_TTL']
+    for entry in os.scandir(directory):
+        # Another worker may be purging the same files
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        with _hashers_lock:
+            _hashers.pop(entry.name.split('.')[0], None)
+
+
+def create_upload(kind, filename, size, user_id, sha256=None):
+    """Open an upload session for a file of the given kind and total size"""
+    if kind not in UPLOAD_EXTENSIONS:
+        raise UploadError(f"Kind must be one of {', '.join(UPLOAD_EXTENSIONS)}")
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in UPLOAD_EXTENSIONS[kind]:
+        raise UploadError(f"Unsupported {kind} file type: {ext or 'none'}")
+    if not isinstance(size, int) or size < 1:
+        raise UploadError("Size must be a positive integer")
+    if size > current_app.config['UPLOAD_MAX_SIZE']:
+        raise UploadError(f"Upload exceeds {current_app.config['UPLOAD_MAX_SIZE']} bytes", 413)
+
+    purge_stale_uploads()
+
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = _paths(upload_id)
+    meta = {
+        'kind': kind,
+        'ext': ext,
+        'size': size,
+        'sha256': sha256.lower() if sha256 else None,
+        'user_id': str(user_id)
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    open(part_path, 'wb').close()
+
+    with _hashers_lock:
+        _hashers[upload_id] = (0, hashlib.sha256())
+    return _state(upload_id, meta, part_path)
+
+
+def get_upload(upload_id, user_id):
+    """Current state of an upload session owned by user_id"""
+    part_path, meta_path = _paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise UploadError("Upload not found", 404)
+    if meta['user_id'] != str(user_id):
+        raise UploadError("Upload not found", 404)
+    return _state(uuid.UUID(upload_id).hex, meta, part_path)
+
+
+def append_chunk(upload_id, offset, stream, user_id):
+    """
+    Append the next chunk of an upload, which must start at offset.
+
+    Returns the updated upload state.
+    """
+    state = get_upload(upload_id, user_id)
+    upload_id = state['id']
+    part_path, _ = _paths(upload_id)
+
+    with open(part_path, 'ab') as target:
+        # Serialize writers of the same upload across threads and workers
+        fcntl.flock(target, fcntl.LOCK_EX)
+        current = os.fstat(target.fileno()).st_size
+        if offset != current:
+            raise UploadError(f"Expected offset {current}", 409)
+
+        with _hashers_lock:
+            position, hasher = _hashers.pop(upload_id, (None, None))
+        if position != current:
+            # Earlier chunks went to another worker; hash the file on completion
+            hasher = _NullHasher()
+
+        try:
+            size = write_stream(stream, target, hasher, max_size=state['size'], size=current)
+        except UploadTooLarge:
+            target.truncate(current)
+            raise UploadError("Chunk goes past the declared size", 413)
+
+        if not isinstance(hasher, _NullHasher):
+            with _hashers_lock:
+                _hashers[upload_id] = (size, hasher)
+
+    state['offset'] = size
+    return state
+
+
+def complete_upload(upload_id, user_id):
+    """
+    Verify a fully received upload and move it into the content-addressed store.
+
+    Returns the stored filename, its SHA-256, size and whether it was a duplicate.
+    """
+    state = get_upload(upload_id, user_id)
+    upload_id = state['id']
+    part_path, meta_path = _paths(upload_id)
+    if state['offset'] != state['size']:
+        raise UploadError(f"Upload incomplete: {state['offset']} of {state['size']} bytes received", 409)
+
+    with _hashers_lock:
+        position, hasher = _hashers.pop(upload_id, (None, None))
+    if position != state['size']:
+        hasher = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(current_app.config['UPLOAD_BUFFER_SIZE']), b''):
+                hasher.update(chunk)
+    digest = hasher.hexdigest()
+
+    if state['sha256'] and state['sha256'] != digest:
+        os.remove(part_path)
+        os.remove(meta_path)
+        raise UploadError("Checksum mismatch, upload discarded", 422)
+
+    store = current_app.extensions['asset_store']
+    filename, duplicate = store.put_file(part_path, digest, state['ext'], state['size'])
+    os.remove(meta_path)
+    return {'filename': filename, 'sha256': digest, 'size': state['size'], 'duplicate': duplicate}
@@ -0,0 +1,236 @@
+# app/utils/asset_store.py
+"""
+Content-addressed store for book covers and PDFs.
+
+Every file is named <sha256><ext> and kept in a two-level sharded directory
+(assets/ab/cd/abcd...ef.pdf), so no directory grows past a few hundred
+entries. Books refer to files by that bare name; identical uploads share one
+file, and the assets table counts how many book columns point at each of them
+so unreferenced files can be collected.
+
+Missing covers and PDFs are answered with built-in placeholders instead of
+placeholder copies on disk.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$')
+
+# 1x1 transparent PNG
+PLACEHOLDER_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c4'
+    '890000000b49444154789c6360000200000500017a5eab3f0000000049454e44'
+    'ae426082'
+)
+
+# Single blank page
+PLACEHOLDER_PDF = (
+    b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n'
+    b'2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n'
+    b'3 0 obj<</Type/Page/MediaBox[0 0 612 792]/Parent 2 0 R/Resources<<>>>>endobj\n'
+    b'xref\n0 4\n0000000000 65535 f\n0000000010 00000 n\n0000000053 00000 n\n'
+    b'0000000102 00000 n\ntrailer<</Size 4/Root 1 0 R>>\nstartxref\n178\n%%EOF\n'
+)
+
+PLACEHOLDERS = {
+    '.pdf': (PLACEHOLDER_PDF, 'application/pdf'),
+    '.jpg': (PLACEHOLDER_PNG, 'image/png'),
+    '.jpeg': (PLACEHOLDER_PNG, 'image/png'),
+    '.png': (PLACEHOLDER_PNG, 'image/png'),
+    '.webp': (PLACEHOLDER_PNG, 'image/png'),
+    '.gif': (PLACEHOLDER_PNG, 'image/png'),
+}
+
+# Book columns holding asset names
+BOOK_FILE_COLUMNS = ('image', 'pdf')
+
+
+def is_content_addressed(name):
+    """Whether a file name is the content hash of the file"""
+    return CONTENT_ADDRESSED_NAME.match(os.path.basename(name)) is not None
+
+
+def get_placeholder(name):
+    """Placeholder bytes and mimetype for a missing file, or None if there is none"""
+    return PLACEHOLDERS.get(os.path.splitext(name)[1].lower())
+
+
+class AssetStore:
+    """Sharded, deduplicated, reference-counted file store"""
+
+    def __init__(self, app=None):
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = os.path.join(app.static_folder, 'uploads', 'assets')
+        self.tmp_dir = os.path.join(self.root, '.tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.buffer_size = app.config.get('UPLOAD_BUFFER_SIZE', 1024 * 1024)
+        self.gc_grace = app.config.get('ASSET_GC_GRACE', 24 * 3600)
+        self.db = app.extensions['sqlalchemy']
+
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            self._listening = True
+
+        app.extensions['asset_store'] = self
+
+    # Paths
+
+    def path_for(self, name):
+        """Sharded path of an asset name"""
+        return os.path.join(self.root, name[:2], name[2:4], name)
+
+    def exists(self, name):
+        return is_content_addressed(name) and os.path.exists(self.path_for(name))
+
+    def temp_file(self):
+        """Open a temp file on the store's filesystem, returning (fd, path)"""
+        return tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+
+    # Writes
+
+    def put_file(self, temp_path, digest, ext, size=None):
+        """
+        Move a fully written temp file into the store under <digest><ext>.
+
+        Returns the asset name and whether an identical file was already
+        stored, in which case the temp file is discarded.
+        """
+        name = f'{digest}{ext.lower()}'
+        path = self.path_for(name)
+        size = os.path.getsize(temp_path) if size is None else size
+
+        if os.path.exists(path):
+            os.remove(temp_path)
+            duplicate = True
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Same filesystem, so the file appears complete or not at all
+            os.replace(temp_path, path)
+            duplicate = False
+
+        # A fresh put restarts the garbage collection grace period
+        os.utime(path)
+        self._register(name, size)
+        return name, duplicate
+
+    def put_path(self, source_path, ext=None, move=False):
+        """Hash an existing file and store it, returning (name, duplicate)"""
+        ext = ext if ext is not None else os.path.splitext(source_path)[1]
+        hasher = hashlib.sha256()
+        with open(source_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.buffer_size), b''):
+                hasher.update(chunk)
+
+        if move:
+            fd, temp_path = self.temp_file()
+            os.close(fd)
+            os.replace(source_path, temp_path)
+        else:
+            fd, temp_path = self.temp_file()
+            with os.fdopen(fd, 'wb') as target, open(source_path, 'rb') as source:
+                for chunk in iter(lambda: source.read(self.buffer_size), b''):
+                    target.write(chunk)
+        return self.put_file(temp_path, hasher.hexdigest(), ext)
+
+    def _register(self, name, size):
+        """Record an asset row, in its own transaction so it matches the file on disk"""
+        from app.models.asset import Asset
+
+        now = datetime.utcnow()
+        with self.db.engine.begin() as conn:
+            conn.execute(
+                insert(Asset.__table__)
+                .values(id=uuid.uuid4(), name=name, size=size, refcount=0,
+                        created_at=now, updated_at=now)
+                .on_conflict_do_nothing(index_elements=['name'])
+            )
+
+    def collect_garbage(self, dry_run=False):
+        """
+        Delete stored files no book refers to any more.
+
+        Files younger than ASSET_GC_GRACE are kept, since a fresh upload is
+        not yet attached to a book. Returns the names of removed assets.
+        """
+        from app.models.asset import Asset
+
+        cutoff = time.time() - self.gc_grace
+        removed = []
+        for asset in Asset.query.filter(Asset.refcount <= 0).all():
+            path = self.path_for(asset.name)
+            if os.path.exists(path) and os.path.getmtime(path) >= cutoff:
+                continue
+            removed.append(asset.name)
+            if not dry_run:
+                if os.path.exists(path):
+                    os.remove(path)
+                self.db.session.delete(asset)
+        if not dry_run:
+            self.db.session.commit()
+        return removed
+
+    # Reference counting
+
+    def recount(self):
+        """Recompute every reference count from the books table"""
+        from app.models import Asset, Book
+
+        assets = Asset.__table__
+        books = Book.__table__
+        references = [
+            select(func.count()).where(books.c[column] == assets.c.name).scalar_subquery()
+            for column in BOOK_FILE_COLUMNS
+        ]
+        self.db.session.execute(update(assets).values(refcount=sum(references)))
+
+    def _after_flush(self, session, flush_context):
+        deltas = {}
+
+        def count(name, delta):
+            if name and is_content_addressed(name):
+                deltas[name] = deltas.get(name, 0) + delta
+
+        for obj in session.new:
+            if getattr(obj, '__tablename__', None) == 'books':
+                for column in BOOK_FILE_COLUMNS:
+                    count(getattr(obj, column), 1)
+        for obj in session.deleted:
+            if getattr(obj, '__tablename__', None) == 'books':
+                for column in BOOK_FILE_COLUMNS:
+                    history = inspect(obj).attrs[column].history
+                    for name in history.deleted or history.unchanged:
+                        count(name, -1)
+        for obj in session.dirty:
+            if getattr(obj, '__tablename__', None) == 'books':
+                for column in BOOK_FILE_COLUMNS:
+                    history = inspect(obj).attrs[column].history
+                    for name in history.added:
+                        count(name, 1)
+                    for name in history.deleted:
+                        count(name, -1)
+
+        if not deltas:
+            return
+
+        from app.models.asset import Asset
+
+        connection = session.connection()
+        for name, delta in deltas.items():
+            if delta:
+                connection.execute(
+                    update(Asset.__table__)
+                    .where(Asset.__table__.c.name == name)
+                    .values(refcount=Asset.__table__.c.refcount + delta)
+                )
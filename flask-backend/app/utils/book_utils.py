@@ -1,8 +1,18 @@
 # app/utils/book_utils.py
+import hashlib
 import os
 import shutil
 from flask import current_app
-import uuid
+
+# Extensions accepted for each kind of book file
+UPLOAD_EXTENSIONS = {
+    'image': {'.jpg', '.jpeg', '.png', '.webp', '.gif'},
+    'pdf': {'.pdf'},
+}
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds UPLOAD_MAX_SIZE"""
 
 def ensure_upload_directories():
     """Ensure all necessary upload directories exist"""
@@ -12,14 +22,6 @@ def ensure_upload_directories():
     # Make sure the main uploads directory exists
     os.makedirs(uploads_path, exist_ok=True)
     
-    # Create placeholder image if it doesn't exist
-    placeholder_path = os.path.join(uploads_path, 'placeholder.png')
-    if not os.path.exists(placeholder_path):
-        # You might want to copy a default image here, or create one programmatically
-        # For now, we'll just create an empty file as a placeholder
-        with open(placeholder_path, 'w') as f:
-            f.write('')
-    
     return uploads_path
 
 def get_book_image_path(image_filename):
@@ -32,17 +34,50 @@ def get_book_pdf_path(pdf_filename):
     uploads_path = ensure_upload_directories()
     return os.path.join(uploads_path, pdf_filename)
 
-def save_uploaded_file(uploaded_file, filename=None):
-    """Save an uploaded file to the uploads directory"""
-    if not filename:
-        # Generate a unique filename if none provided
-        ext = os.path.splitext(uploaded_file.filename)[1]
-        filename = f"{uuid.uuid4()}{ext}"
-    
-    uploads_path = ensure_upload_directories()
-    file_path = os.path.join(uploads_path, filename)
-    
-    # Save the file
-    uploaded_file.save(file_path)
-    
-    return filename
\ No newline at end of file
+def write_stream(stream, target, hasher, chunk_size=None, max_size=None, size=0):
+    """
+    Copy a stream into an open file in fixed-size chunks, hashing as it writes.
+
+    Returns the total number of bytes written, starting from size.
+    Raises UploadTooLarge once more than max_size bytes have been written.
+    """
+    chunk_size = chunk_size or current_app.config['UPLOAD_BUFFER_SIZE']
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return size
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+        hasher.update(chunk)
+        target.write(chunk)
+
+
+def save_stream(stream, kind, ext):
+    """
+    Stream an upload into the content-addressed asset store.
+
+    Memory use is bounded by the buffer size whatever the file size.
+    Returns the stored filename, its SHA-256, size and whether it was a duplicate.
+    """
+    store = current_app.extensions['asset_store']
+    hasher = hashlib.sha256()
+    fd, temp_path = store.temp_file()
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            size = write_stream(stream, target, hasher, max_size=current_app.config['UPLOAD_MAX_SIZE'])
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    filename, duplicate = store.put_file(temp_path, hasher.hexdigest(), ext, size)
+    return {'filename': filename, 'sha256': hasher.hexdigest(), 'size': size, 'duplicate': duplicate}
+
+
+def save_uploaded_file(uploaded_file, kind='image'):
+    """Save an uploaded file under the hash of its content and return its filename"""
+    ext = os.path.splitext(uploaded_file.filename)[1].lower()
+    if ext not in UPLOAD_EXTENSIONS[kind]:
+        raise ValueError(f"Unsupported {kind} file type: {ext or 'none'}")
+
+    return save_stream(uploaded_file.stream, kind, ext)['filename']
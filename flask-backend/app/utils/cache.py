@@ -0,0 +1,221 @@
+# app/utils/cache.py
+"""
+Two-tier cache for catalog reads: a bounded LRU in each worker in front of
+the shared Redis used for sessions.
+
+Keys are namespaced by a catalog version kept in Redis. Committing a change to
+a catalog table bumps the version, so every worker starts reading fresh keys
+once it notices the new version (at most CATALOG_VERSION_CHECK_INTERVAL
+seconds later) and stale entries simply expire. A change committed while Redis
+is unreachable is published once it is back.
+
+Without Redis, workers cannot see each other's writes, so local entries are
+only kept for CATALOG_LOCAL_TTL seconds.
+
+A load that ran on a read replica within DB_REPLICA_MAX_LAG seconds of a
+version change may predate the change, so it is served but not kept.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.utils.db_routing import read_staleness
+
+CATALOG_TABLES = ('books', 'authors', 'genres')
+
+
+class CatalogCache:
+    """Versioned LRU + Redis cache for catalog data"""
+
+    version_key = 'catalog:version'
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_size = app.config.get('CATALOG_CACHE_SIZE', 1024)
+        self.ttl = app.config.get('CATALOG_CACHE_TTL', 300)
+        self.check_interval = app.config.get('CATALOG_VERSION_CHECK_INTERVAL', 1.0)
+        self.retry_interval = app.config.get('CATALOG_REDIS_RETRY_INTERVAL', 30)
+        self.local_ttl = app.config.get('CATALOG_LOCAL_TTL', 5)
+
+        # Share the session Redis; without it the cache runs local-only
+        self.redis = app.config.get('SESSION_REDIS')
+
+        self._local = OrderedDict()
+        self._version = 0
+        self._version_checked_at = 0.0
+        # When this worker last saw the version change; a fresh worker cannot
+        # tell how recent the last change was
+        self._changed_at = time.monotonic()
+        self._redis_down_until = 0.0
+        if app.config.get('SESSION_TYPE') != 'redis':
+            # Redis did not answer at startup; it is tried again like after any failure
+            self._redis_down_until = time.monotonic() + self.retry_interval
+        # Set when a change could not be published to Redis
+        self._invalidation_pending = False
+        self._stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0, 'invalidations': 0, 'unsettled': 0}
+
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+            self._listening = True
+
+        app.extensions['catalog_cache'] = self
+
+    # Redis access
+
+    def _redis_available(self):
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, error):
+        print(f"WARNING: Catalog cache Redis error, using local cache only: {error}")
+        self._redis_down_until = time.monotonic() + self.retry_interval
+
+    def _redis_key(self, version, key):
+        return f'catalog:v{version}:{key}'
+
+    # Versioning
+
+    def version(self):
+        """Current catalog version, refreshed from Redis at most once per interval"""
+        now = time.monotonic()
+        if now - self._version_checked_at < self.check_interval or not self._redis_available():
+            return self._version
+
+        try:
+            if self._invalidation_pending:
+                version = int(self.redis.incr(self.version_key))
+                self._invalidation_pending = False
+            else:
+                version = int(self.redis.get(self.version_key) or 0)
+            if version < self._version:
+                # Redis lost the version or missed our changes; never go back
+                # to keys that may hold data from before them
+                version = int(self.redis.incrby(self.version_key, self._version - version + 1))
+        except redis.exceptions.RedisError as e:
+            self._redis_failed(e)
+            return self._version
+
+        with self._lock:
+            self._version_checked_at = now
+            if version > self._version:
+                self._version = version
+                self._changed_at = now
+                self._local.clear()
+            return self._version
+
+    def invalidate(self):
+        """Move to a new catalog version, dropping every cached entry"""
+        version = None
+        if self._redis_available():
+            try:
+                version = int(self.redis.incr(self.version_key))
+            except redis.exceptions.RedisError as e:
+                self._redis_failed(e)
+        if version is None:
+            # Publish the change once Redis is reachable again
+            self._invalidation_pending = self.redis is not None
+            version = self._version + 1
+
+        with self._lock:
+            self._version = max(version, self._version + 1)
+            self._version_checked_at = self._changed_at = time.monotonic()
+            self._local.clear()
+            self._stats['invalidations'] += 1
+        return version
+
+    # Reads
+
+    def settled(self):
+        """Whether this request's reads so far are known to include the latest catalog change"""
+        staleness = read_staleness()
+        return staleness == 0 or time.monotonic() - self._changed_at >= staleness
+
+    def get(self, key, loader):
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        Values must be JSON-serializable. None is never cached.
+        """
+        version = self.version()
+        local_key = (version, key)
+
+        # Only Redis lets other workers' writes reach this one
+        ttl = self.ttl if self._redis_available() else self.local_ttl
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is not None:
+                value, stored_at = entry
+                if time.monotonic() - stored_at < ttl:
+                    self._local.move_to_end(local_key)
+                    self._stats['local_hits'] += 1
+                    return value
+                del self._local[local_key]
+
+        value = None
+        if self._redis_available():
+            try:
+                raw = self.redis.get(self._redis_key(version, key))
+                if raw is not None:
+                    value = json.loads(raw)
+            except redis.exceptions.RedisError as e:
+                self._redis_failed(e)
+
+        if value is not None:
+            self._stats['redis_hits'] += 1
+        else:
+            self._stats['misses'] += 1
+            value = loader()
+            if value is None:
+                return None
+            if not self.settled():
+                # Maybe read from before the change; the next request reads again
+                self._stats['unsettled'] += 1
+                return value
+            if self._redis_available():
+                try:
+                    self.redis.set(self._redis_key(version, key), json.dumps(value), ex=self.ttl)
+                except redis.exceptions.RedisError as e:
+                    self._redis_failed(e)
+
+        with self._lock:
+            self._local[local_key] = (value, time.monotonic())
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+        return value
+
+    def stats(self):
+        """Hit/miss counters and current state"""
+        with self._lock:
+            return dict(
+                self._stats,
+                version=self._version,
+                invalidation_pending=self._invalidation_pending,
+                size=len(self._local),
+                max_size=self.max_size,
+                mode='redis' if self._redis_available() else 'local'
+            )
+
+    # Write-through invalidation
+
+    def _after_flush(self, session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if getattr(obj, '__tablename__', None) in CATALOG_TABLES:
+                session.info['catalog_changed'] = True
+                return
+
+    def _after_commit(self, session):
+        if session.info.pop('catalog_changed', False):
+            self.invalidate()
+
+    def _after_rollback(self, session):
+        session.info.pop('catalog_changed', None)
@@ -0,0 +1,141 @@
+# app/utils/db_pool.py
+"""
+SQLAlchemy engine options and connection pool metrics.
+
+Each worker process keeps DB_POOL_SIZE connections (by default one per request
+thread, WEB_THREADS) plus up to DB_MAX_OVERFLOW more during bursts, and waits
+at most DB_POOL_TIMEOUT seconds for one. Connections are pinged before use and
+replaced after DB_POOL_RECYCLE seconds, so a PostgreSQL failover costs a
+reconnect rather than failed requests.
+
+With DB_PGBOUNCER set, the app connects through PgBouncer in transaction
+pooling mode. PgBouncer does the pooling, so the app opens a connection per
+checkout (NullPool), and drivers that prepare statements server-side are told
+not to, since consecutive transactions may run on different server
+connections. psycopg2 never prepares statements.
+"""
+import os
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+def _env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('true', '1', 't', 'yes')
+
+
+class PoolStats:
+    """How long requests waited for a connection, and how far the pool overflowed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._checkouts = 0
+            self._wait_total = 0.0
+            self._wait_max = 0.0
+            self._timeouts = 0
+            self._overflow_max = 0
+
+    def record_checkout(self, wait, overflow):
+        with self._lock:
+            self._checkouts += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._overflow_max = max(self._overflow_max, overflow)
+
+    def record_timeout(self):
+        with self._lock:
+            self._timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'checkouts': checkouts,
+                'checkout_wait_avg_ms': round(self._wait_total / checkouts * 1000, 2) if checkouts else 0.0,
+                'checkout_wait_max_ms': round(self._wait_max * 1000, 2),
+                'timeouts': self._timeouts,
+                'overflow_max': self._overflow_max,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records checkout wait times in its own PoolStats"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; the counters carry over
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record_checkout(time.perf_counter() - started, self.overflow())
+        return record
+
+
+def engine_options(uri, pool_size=None, max_overflow=2, pool_timeout=10, pool_recycle=1800):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for uri. The arguments are per-environment
+    defaults; the DB_* environment variables override them.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() != 'postgresql':
+        # SQLite picks its own pool
+        return {}
+
+    threads = int(os.environ.get('WEB_THREADS', 4))
+    options = {
+        'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', True),
+        'connect_args': {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5))},
+    }
+
+    if _env_flag('DB_PGBOUNCER'):
+        options['poolclass'] = NullPool
+        if url.get_driver_name() == 'psycopg':
+            options['connect_args']['prepare_threshold'] = None
+        return options
+
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', pool_size or threads)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', pool_timeout)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', pool_recycle)),
+        # Reuse the most recent connection, so idle ones age out through recycle
+        'pool_use_lifo': True,
+    })
+    return options
+
+
+def pool_metrics(engine):
+    """Live pool state of engine plus the checkout counters"""
+    pool = engine.pool
+    metrics = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+        })
+    if isinstance(pool, TimedQueuePool):
+        metrics.update(pool.stats.snapshot())
+    return metrics
@@ -0,0 +1,194 @@
+# app/utils/db_routing.py
+"""
+Read-replica routing.
+
+Views decorated with @read_replica run their queries on one of the
+SQLALCHEMY_REPLICA_URIS, picked round-robin per request among the healthy
+ones. A replica counts as healthy when it answers and, on PostgreSQL, is no
+more than DB_REPLICA_MAX_LAG seconds behind; this is checked every
+DB_REPLICA_CHECK_INTERVAL seconds. A replica that fails is skipped for
+DB_REPLICA_RETRY_INTERVAL seconds, and a read that failed on it is run again
+on the primary.
+
+Everything else uses the primary, and so does the rest of a read-only request
+once it writes, so it reads its own writes. A request can ask for the primary
+with the DB_PRIMARY_HEADER header (e.g. right after a write of its own), and
+code can call use_primary(). Caches check read_staleness() before keeping
+what such a request read.
+"""
+import itertools
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, exc, text
+from app.utils.db_pool import pool_metrics
+
+LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    """One replica engine and what is known about its health"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.name = engine.url.render_as_string(hide_password=True)
+        self.healthy = True
+        self.checked_at = 0.0
+        self.lag = None
+        self.reads = 0
+        self.failures = 0
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'healthy': self.healthy,
+            'lag_seconds': self.lag,
+            'reads': self.reads,
+            'failures': self.failures,
+            'pool': pool_metrics(self.engine),
+        }
+
+
+class ReplicaRouter:
+    """Round-robin over healthy replicas"""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.replicas = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.check_interval = app.config.get('DB_REPLICA_CHECK_INTERVAL', 10)
+        self.retry_interval = app.config.get('DB_REPLICA_RETRY_INTERVAL', 30)
+        self.max_lag = app.config.get('DB_REPLICA_MAX_LAG', 5)
+        self.header = app.config.get('DB_PRIMARY_HEADER', 'X-Read-Primary')
+        self.configure(app.config.get('SQLALCHEMY_REPLICA_URIS', ()), app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        app.extensions['replica_router'] = self
+
+    def configure(self, uris, engine_options=None):
+        """Replace the replicas with engines for uris"""
+        replicas = [Replica(create_engine(uri, **(engine_options or {}))) for uri in uris]
+        with self._lock:
+            old, self.replicas = self.replicas, replicas
+            self._counter = itertools.count()
+        for replica in old:
+            replica.engine.dispose()
+
+    def _check(self, replica):
+        try:
+            with replica.engine.connect() as conn:
+                if replica.engine.dialect.name == 'postgresql':
+                    lag = conn.execute(LAG_SQL).scalar()
+                    replica.lag = round(float(lag or 0), 3)
+                else:
+                    conn.execute(text('SELECT 1'))
+                    replica.lag = 0.0
+        except exc.SQLAlchemyError as e:
+            self.mark_down(replica, e)
+            return False
+        replica.healthy = replica.lag <= self.max_lag
+        if not replica.healthy:
+            print(f"WARNING: Replica {replica.name} is {replica.lag}s behind, reading from the primary")
+        return replica.healthy
+
+    def _usable(self, replica):
+        interval = self.check_interval if replica.healthy else self.retry_interval
+        now = time.monotonic()
+        if now - replica.checked_at < interval:
+            return replica.healthy
+        # Other threads keep the previous verdict while this one checks
+        replica.checked_at = now
+        return self._check(replica)
+
+    def choose(self):
+        """Next healthy replica, or None to use the primary"""
+        with self._lock:
+            replicas = self.replicas
+            start = next(self._counter) if replicas else 0
+        for offset in range(len(replicas)):
+            replica = replicas[(start + offset) % len(replicas)]
+            if self._usable(replica):
+                replica.reads += 1
+                return replica
+        return None
+
+    def mark_down(self, replica, error):
+        print(f"WARNING: Replica {replica.name} failed, reading from the primary: {error}")
+        replica.healthy = False
+        replica.failures += 1
+        replica.checked_at = time.monotonic()
+
+    def stats(self):
+        return [replica.stats() for replica in self.replicas]
+
+
+def use_primary():
+    """Send the rest of this request's queries to the primary"""
+    g.db_route = 'primary'
+
+
+def read_staleness():
+    """Seconds this request's reads may trail the primary: DB_REPLICA_MAX_LAG once one went to a replica, else 0"""
+    if not has_app_context() or g.get('db_route') != 'replica' or g.get('db_replica') is None:
+        return 0
+    return current_app.extensions['replica_router'].max_lag
+
+
+def _replica_for(session, clause):
+    if g.get('db_route') != 'replica':
+        return None
+    # Writes, and everything after them, stay on the primary
+    if session._flushing or session.new or session.dirty or session.deleted or getattr(clause, 'is_dml', False):
+        use_primary()
+        return None
+    replica = g.get('db_replica')
+    if replica is None:
+        replica = current_app.extensions['replica_router'].choose()
+        if replica is None:
+            use_primary()
+            return None
+        g.db_replica = replica
+    return replica
+
+
+class RoutingSession(Session):
+    """db.session that sends the reads of @read_replica views to a replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            replica = _replica_for(self, clause)
+            if replica is not None:
+                return replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """Run a read-only view against a replica when one is available"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = current_app.extensions.get('replica_router')
+        if router is None or not router.replicas or request.headers.get(router.header):
+            return view(*args, **kwargs)
+
+        g.db_route = 'replica'
+        try:
+            return view(*args, **kwargs)
+        except exc.OperationalError as e:
+            replica = g.get('db_replica')
+            # Only a failed read is safe to run again
+            if replica is None or g.get('db_route') != 'replica':
+                raise
+            router.mark_down(replica, e)
+            current_app.extensions['sqlalchemy'].session.rollback()
+            use_primary()
+            return view(*args, **kwargs)
+        finally:
+            g.pop('db_route', None)
+            g.pop('db_replica', None)
+    return wrapper
@@ -0,0 +1,88 @@
+# app/utils/file_delivery.py
+"""
+Delivery of uploaded covers and PDFs.
+
+Content-addressed names are looked up in the sharded asset store first, and
+missing covers and PDFs are answered with a placeholder. In the default
+'direct' mode files are streamed by Werkzeug with byte-range, ETag and
+If-Modified-Since support. The 'x-accel' (nginx) and 'x-sendfile'
+(Apache, lighttpd) modes only resolve the file and hand the transfer over to
+the front proxy, which then also answers range and conditional requests.
+"""
+import mimetypes
+import os
+from flask import abort, current_app, send_file
+from werkzeug.security import safe_join
+from app.utils.asset_store import is_content_addressed, get_placeholder
+
+DELIVERY_MODES = ('direct', 'x-accel', 'x-sendfile')
+
+
+def resolve_upload(directory, filename):
+    """Path of a file to serve, or None if it does not exist"""
+    store = current_app.extensions['asset_store']
+    name = os.path.basename(filename)
+    if store.exists(name):
+        return store.path_for(name)
+
+    path = safe_join(directory, filename)
+    if path is not None and os.path.isfile(path):
+        return path
+    return None
+
+
+def send_placeholder(filename):
+    """Stand-in for a missing cover or PDF, or a 404 for other files"""
+    placeholder = get_placeholder(filename)
+    if placeholder is None:
+        abort(404)
+    data, mimetype = placeholder
+    response = current_app.response_class(data, mimetype=mimetype)
+    # The real file may be uploaded later
+    response.cache_control.no_cache = True
+    return response
+
+
+def send_upload(directory, filename):
+    """Send a file from directory, or let the front proxy send it"""
+    if safe_join(directory, filename) is None:
+        abort(404)
+    path = resolve_upload(directory, filename)
+    if path is None:
+        return send_placeholder(filename)
+
+    immutable = is_content_addressed(filename)
+    etag = os.path.splitext(os.path.basename(path))[0] if immutable else True
+    return send_path(path, immutable=immutable, etag=etag)
+
+
+def send_path(path, immutable=False, etag=True, mimetype=None):
+    """
+    Send a resolved file under the static folder in the configured mode.
+
+    Immutable files are cached for UPLOAD_IMMUTABLE_MAX_AGE, anything else for
+    UPLOAD_MAX_AGE; etag is passed on to send_file in direct mode.
+    """
+    config = current_app.config
+    max_age = config['UPLOAD_IMMUTABLE_MAX_AGE'] if immutable else config['UPLOAD_MAX_AGE']
+    mode = config['FILE_DELIVERY_MODE']
+
+    if mode == 'direct':
+        response = send_file(path, mimetype=mimetype, max_age=max_age, conditional=True, etag=etag)
+        # Werkzeug only advertises ranges when answering a range request, but
+        # PDF viewers look for it on the first response to read lazily
+        response.accept_ranges = 'bytes'
+    else:
+        mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = current_app.response_class(mimetype=mimetype)
+        if mode == 'x-accel':
+            relative = os.path.relpath(path, current_app.static_folder).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = f"{config['X_ACCEL_PREFIX'].rstrip('/')}/{relative}"
+        else:
+            response.headers['X-Sendfile'] = path
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+
+    if immutable:
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,216 @@
+# app/utils/identity.py
+"""
+Cached user loader for Flask-Login.
+
+Every authenticated request used to load the full User row. The loader now
+returns a UserPrincipal holding only id, username and email, cached per worker
+for USER_CACHE_TTL seconds and in the session Redis for USER_CACHE_REDIS_TTL
+seconds. Endpoints that only need current_user.id never touch the users
+table; anything else (to_dict(), relationships) loads the ORM User on first
+access, once per request.
+
+Committed changes to a user (password change, deletion) and logout drop the
+cached principal. Other workers may keep theirs for up to USER_CACHE_TTL.
+While Redis is unreachable the cache is per worker only; Redis is tried again
+every USER_CACHE_REDIS_RETRY_INTERVAL seconds, and users changed meanwhile
+are dropped from it first.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import redis
+from flask import g
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class UserPrincipal(UserMixin):
+    """The logged-in user as far as most requests need it"""
+
+    _user = None
+
+    def __init__(self, user_id, username, email):
+        self.id = user_id
+        self.username = username
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email)
+
+    def to_cache(self):
+        return {'id': str(self.id), 'username': self.username, 'email': self.email}
+
+    @classmethod
+    def from_cache(cls, data):
+        return cls(uuid.UUID(data['id']), data['username'], data['email'])
+
+    @property
+    def user(self):
+        """The full User row, loaded on first use"""
+        if self._user is None:
+            from app import db
+            from app.models import User
+            from app.utils.db_routing import use_primary
+            self._user = db.session.get(User, self.id)
+            if self._user is None and g.get('db_route') == 'replica':
+                # A replica may not have the user yet, e.g. right after signing up
+                use_primary()
+                self._user = db.session.get(User, self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        # Only reached for attributes the principal does not have itself
+        user = self.user
+        if user is None:
+            raise AttributeError(name)
+        return getattr(user, name)
+
+
+class IdentityCache:
+    """Per-worker TTL cache of user principals, with Redis behind it"""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('USER_CACHE_TTL', 30)
+        self.redis_ttl = app.config.get('USER_CACHE_REDIS_TTL', 300)
+        self.max_size = app.config.get('USER_CACHE_SIZE', 10000)
+        self.db = app.extensions['sqlalchemy']
+
+        self.retry_interval = app.config.get('USER_CACHE_REDIS_RETRY_INTERVAL', 30)
+
+        # Share the session Redis, like the catalog cache
+        self.redis = app.config.get('SESSION_REDIS')
+        self._redis_down_until = 0.0
+        if app.config.get('SESSION_TYPE') != 'redis':
+            # Redis did not answer at startup; it is tried again like after any failure
+            self._redis_down_until = time.monotonic() + self.retry_interval
+        # Users changed while Redis was unreachable, dropped from it once it is back
+        self._pending_deletes = set()
+
+        self._local = OrderedDict()
+        self._stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0, 'invalidations': 0}
+
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+            self._listening = True
+
+        app.extensions['identity_cache'] = self
+
+    def _redis_key(self, user_id):
+        return f'user:principal:{user_id}'
+
+    def _redis_available(self):
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_call(self, method, *args, **kwargs):
+        if not self._redis_available():
+            return None
+        try:
+            if self._pending_deletes:
+                with self._lock:
+                    keys, self._pending_deletes = self._pending_deletes, set()
+                try:
+                    self.redis.delete(*keys)
+                except redis.exceptions.RedisError:
+                    with self._lock:
+                        self._pending_deletes |= keys
+                    raise
+            return getattr(self.redis, method)(*args, **kwargs)
+        except redis.exceptions.RedisError as e:
+            print(f"WARNING: User cache Redis error, using local cache only: {e}")
+            self._redis_down_until = time.monotonic() + self.retry_interval
+            return None
+
+    def _remember(self, principal):
+        with self._lock:
+            self._local[principal.id] = (principal.to_cache(), time.monotonic())
+            self._local.move_to_end(principal.id)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def load(self, user_id):
+        """Principal for a user id from the session, or None if there is no such user"""
+        try:
+            user_id = uuid.UUID(str(user_id))
+        except ValueError:
+            return None
+
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is not None:
+                data, stored_at = entry
+                if time.monotonic() - stored_at < self.ttl:
+                    self._local.move_to_end(user_id)
+                    self._stats['local_hits'] += 1
+                    return UserPrincipal.from_cache(data)
+                del self._local[user_id]
+
+        raw = self._redis_call('get', self._redis_key(user_id))
+        if raw is not None:
+            principal = UserPrincipal.from_cache(json.loads(raw))
+            self._stats['redis_hits'] += 1
+            self._remember(principal)
+            return principal
+
+        from app.models import User
+        self._stats['misses'] += 1
+        row = self.db.session.execute(
+            self.db.select(User.id, User.username, User.email).filter_by(id=user_id)
+        ).first()
+        if row is None:
+            return None
+        principal = UserPrincipal(*row)
+        self.store(principal)
+        return principal
+
+    def store(self, principal):
+        """Cache a principal, e.g. right after login"""
+        if not isinstance(principal, UserPrincipal):
+            principal = UserPrincipal.from_user(principal)
+        self._remember(principal)
+        self._redis_call('set', self._redis_key(principal.id), json.dumps(principal.to_cache()), ex=self.redis_ttl)
+        return principal
+
+    def invalidate(self, user_id):
+        """Forget a user, so the next request reads it from the database"""
+        try:
+            user_id = uuid.UUID(str(user_id))
+        except ValueError:
+            return
+        with self._lock:
+            self._local.pop(user_id, None)
+            self._stats['invalidations'] += 1
+        key = self._redis_key(user_id)
+        if self.redis is not None and self._redis_call('delete', key) is None:
+            # Redis may still hold the old principal when it is back
+            with self._lock:
+                self._pending_deletes.add(key)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._local), max_size=self.max_size, ttl=self.ttl)
+
+    # Invalidation on committed user changes
+
+    def _after_flush(self, session, flush_context):
+        for obj in (*session.dirty, *session.deleted):
+            if getattr(obj, '__tablename__', None) == 'users':
+                session.info.setdefault('changed_users', set()).add(obj.id)
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop('changed_users', ()):
+            self.invalidate(user_id)
+
+    def _after_rollback(self, session):
+        session.info.pop('changed_users', None)
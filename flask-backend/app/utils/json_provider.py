@@ -0,0 +1,48 @@
+# app/utils/json_provider.py
+"""
+JSON provider used for every API response.
+
+Uses orjson when it is installed and the standard library otherwise. Either
+way UUIDs are encoded as strings and datetimes in ISO 8601, so models can
+hand them over without converting them first.
+"""
+import json
+import uuid
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider with a fast path through orjson"""
+
+    default = staticmethod(_default)
+    use_orjson = orjson is not None
+
+    def dumps(self, obj, **kwargs):
+        if not self.use_orjson:
+            return super().dumps(obj, **kwargs)
+
+        option = 0
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if not self.use_orjson or kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
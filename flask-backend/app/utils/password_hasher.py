@@ -0,0 +1,209 @@
+# app/utils/password_hasher.py
+"""
+bcrypt hashing and verification off the request thread.
+
+bcrypt is deliberately slow (~250ms of CPU at cost 12), so running it inside
+gunicorn workers lets a login spike starve every other request. Hashes are
+computed in a small dedicated process pool instead; the request thread only
+waits for the result. At most PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT
+operations are in flight per worker, and anything beyond that fails straight
+away with PasswordHasherBusy (answered with a 503) rather than queueing.
+
+The cost factor is BCRYPT_LOG_ROUNDS; hashes made with another cost are
+rehashed on the next successful login. With PASSWORD_HASH_WORKERS = 0 hashing
+runs inline, which is only meant for tools and tests.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+
+class PasswordHasherBusy(Exception):
+    """The hashing pool is saturated; the client should retry shortly"""
+
+
+def _hash(password, rounds):
+    started = time.time()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+    return hashed.decode('utf-8'), started, time.time() - started
+
+
+def _check(hashed, password):
+    started = time.time()
+    try:
+        valid = bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # Not a bcrypt hash
+        valid = False
+    return valid, started, time.time() - started
+
+
+def hash_rounds(hashed):
+    """Cost factor of a bcrypt hash, or None if it is not one"""
+    parts = hashed.split('$') if hashed else []
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pool_context():
+    """
+    Start method for pool processes.
+
+    The pool is started from request threads, and forking while another thread
+    holds a lock (logging, the Redis and database pools, malloc) can deadlock
+    the child. The fork server forks from a clean single-threaded process
+    instead, with this module preloaded so that starting a process is cheap;
+    the pool functions need it imported, not the app built.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class PasswordHasher:
+    """Bounded process pool for bcrypt"""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.queue_limit = app.config.get('PASSWORD_HASH_QUEUE_LIMIT', 8)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self._in_flight = 0
+        self._stats = {
+            'hash': {'count': 0, 'total_time': 0.0, 'max_time': 0.0},
+            'check': {'count': 0, 'total_time': 0.0, 'max_time': 0.0},
+            'queue_wait_total': 0.0,
+            'queue_wait_max': 0.0,
+            'rejected': 0,
+            'timeouts': 0,
+            'rehashed': 0,
+        }
+        app.extensions['password_hasher'] = self
+
+    def _get_executor(self):
+        # A pool inherited through fork (gunicorn --preload) is not usable
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, op, function, *args):
+        if not self.workers:
+            result, _, duration = function(*args)
+            self._record(op, duration, 0.0)
+            return result
+
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_limit:
+                self._stats['rejected'] += 1
+                raise PasswordHasherBusy("Too many password operations in progress, try again shortly")
+            self._in_flight += 1
+            executor = self._get_executor()
+
+        submitted = time.time()
+        release = True
+        try:
+            for attempt in range(2):
+                try:
+                    future = executor.submit(function, *args)
+                    result, started, duration = future.result(timeout=self.timeout)
+                    break
+                except BrokenProcessPool:
+                    # A pool process died; start a new pool and retry once
+                    with self._lock:
+                        if self._executor is executor:
+                            self._executor = None
+                        executor = self._get_executor()
+                    if attempt:
+                        raise
+                except TimeoutError:
+                    # cancel() cannot stop a hash already running in the pool;
+                    # it holds a process until it ends, so it counts until then
+                    future.cancel()
+                    release = False
+                    future.add_done_callback(self._release)
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PasswordHasherBusy("Password operation timed out, try again shortly")
+        finally:
+            if release:
+                self._release()
+
+        self._record(op, duration, max(0.0, started - submitted))
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _record(self, op, duration, wait):
+        with self._lock:
+            stats = self._stats[op]
+            stats['count'] += 1
+            stats['total_time'] += duration
+            stats['max_time'] = max(stats['max_time'], duration)
+            self._stats['queue_wait_total'] += wait
+            self._stats['queue_wait_max'] = max(self._stats['queue_wait_max'], wait)
+
+    def hash(self, password):
+        """bcrypt hash of a password at the configured cost"""
+        if not password:
+            raise ValueError('Password must be non-empty.')
+        return self._run('hash', _hash, password.encode('utf-8'), self.rounds)
+
+    def check(self, hashed, password):
+        """Whether password matches a bcrypt hash"""
+        if not hashed or not password:
+            return False
+        return self._run('check', _check, hashed.encode('utf-8'), password.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        """Whether a hash was made with a different cost than the configured one"""
+        return hash_rounds(hashed) != self.rounds
+
+    def record_rehash(self):
+        with self._lock:
+            self._stats['rehashed'] += 1
+
+    def stats(self):
+        """Latency and queue counters, times in milliseconds"""
+        with self._lock:
+            stats = self._stats
+            operations = stats['hash']['count'] + stats['check']['count']
+
+            def summary(op):
+                count = stats[op]['count']
+                return {
+                    'count': count,
+                    'avg_ms': round(stats[op]['total_time'] / count * 1000, 2) if count else 0.0,
+                    'max_ms': round(stats[op]['max_time'] * 1000, 2),
+                }
+
+            return {
+                'hash': summary('hash'),
+                'check': summary('check'),
+                'queue_wait_avg_ms': round(stats['queue_wait_total'] / operations * 1000, 2) if operations else 0.0,
+                'queue_wait_max_ms': round(stats['queue_wait_max'] * 1000, 2),
+                'in_flight': self._in_flight,
+                'rejected': stats['rejected'],
+                'timeouts': stats['timeouts'],
+                'rehashed': stats['rehashed'],
+                'workers': self.workers,
+                'queue_limit': self.queue_limit,
+                'rounds': self.rounds,
+            }
@@ -1,6 +1,6 @@
 # app/utils/security.py
 from functools import wraps
-from flask import jsonify, request, session
+from flask import current_app, jsonify, request, session
 from flask_login import current_user
 
 def auth_required(f):
@@ -10,4 +10,15 @@ def auth_required(f):
         if 'userId' not in session:
             return jsonify({"message": "Please login to access this resource"}), 401
         return f(*args, **kwargs)
-    return decorated
\ No newline at end of file
+    return decorated
+
+def admin_required(f):
+    """Allow only logged-in users listed in ADMIN_USERNAMES; use in place of login_required."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({"message": "Please login to access this resource"}), 401
+        if current_user.username not in current_app.config['ADMIN_USERNAMES']:
+            return jsonify({"message": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,513 @@
+# app/utils/session_store.py
+"""
+Server-side sessions in Redis, with a sharded file store while Redis is down.
+
+Flask-Session's interfaces do a read and a full write of a pickled payload on
+every request that carries a session cookie, even when nothing changed. This
+store loads the session together with its remaining TTL (one pipelined round
+trip on Redis) and then writes:
+
+- nothing, when the session is unchanged and more than half of
+  PERMANENT_SESSION_LIFETIME is left;
+- a TTL refresh, when it is unchanged but less than half the lifetime is left;
+- the whole session, when it changed;
+- a single delete, when it was emptied (logout).
+
+When Redis fails, sessions are kept in SESSION_FILE_DIR instead, one file per
+session in a two-level sharded directory, with the expiry time as the file's
+mtime. A background sweeper removes expired files and, above
+SESSION_FILE_MAX_BYTES, the ones closest to expiring. Redis is tried again
+every SESSION_REDIS_RETRY_INTERVAL seconds; once it answers, sessions created
+during the outage are moved to Redis, so nobody is logged out.
+
+Payloads are msgpack when it is installed and pickle otherwise. Sessions
+written by Flask-Session (plain pickle) are still read.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+import uuid
+import redis
+from flask_session.sessions import ServerSideSession, SessionInterface
+from itsdangerous import want_bytes
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+# First byte of a msgpack payload; pickle payloads start with b'\x80'
+MSGPACK_TAG = b'\x01'
+
+# Temporary files older than this were left behind by a crashed writer
+STALE_TEMP_AGE = 60
+
+
+def redis_client(uri, config):
+    """Redis client on a bounded, blocking connection pool"""
+    pool = redis.BlockingConnectionPool.from_url(
+        uri,
+        max_connections=config['SESSION_REDIS_POOL_SIZE'],
+        timeout=config['SESSION_REDIS_POOL_TIMEOUT'],
+        socket_timeout=config['SESSION_REDIS_SOCKET_TIMEOUT'],
+        socket_connect_timeout=config['SESSION_REDIS_CONNECT_TIMEOUT'],
+        health_check_interval=config['SESSION_REDIS_HEALTH_CHECK_INTERVAL'],
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+class SessionSerializer:
+    """msgpack with a pickle fallback for values msgpack cannot encode"""
+
+    def __init__(self, use_msgpack=True):
+        self.use_msgpack = use_msgpack and msgpack is not None
+
+    @property
+    def name(self):
+        return 'msgpack' if self.use_msgpack else 'pickle'
+
+    def dumps(self, data):
+        if self.use_msgpack:
+            try:
+                return MSGPACK_TAG + msgpack.packb(data, use_bin_type=True)
+            except TypeError:
+                pass
+        return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, value):
+        if value[:1] == MSGPACK_TAG:
+            if msgpack is None:
+                raise ValueError('msgpack session payload but msgpack is not installed')
+            return msgpack.unpackb(value[1:], raw=False)
+        return pickle.loads(value)
+
+
+class SessionStats:
+    """Counters of the operations the session store made"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {
+            'loads': 0, 'writes': 0, 'refreshes': 0, 'skipped': 0, 'deletes': 0,
+            'redis_failures': 0, 'migrated': 0, 'expired': 0, 'evicted': 0,
+        }
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class RedisSessionBackend:
+    """Sessions as Redis keys with a TTL"""
+
+    name = 'redis'
+
+    def __init__(self, client, key_prefix='session:', serializer=None):
+        self.client = client
+        self.key_prefix = key_prefix
+        self.serializer = serializer or SessionSerializer()
+
+    def load(self, sid):
+        """(data, seconds left) of a session, or None"""
+        key = self.key_prefix + sid
+        # The payload and its TTL in one round trip
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        value, pttl = pipe.execute()
+        if value is None:
+            return None
+        # -1: no expiry set, e.g. a key written by hand
+        return self.serializer.loads(value), (pttl / 1000 if pttl >= 0 else None)
+
+    def write(self, sid, data, lifetime):
+        self.client.set(self.key_prefix + sid, self.serializer.dumps(data), ex=lifetime)
+
+    def touch(self, sid, lifetime):
+        self.client.expire(self.key_prefix + sid, lifetime)
+
+    def delete(self, sid):
+        self.client.delete(self.key_prefix + sid)
+
+    def adopt(self, sid, payload, ttl):
+        """Store a serialized session from the file store, unless Redis already has a newer one"""
+        self.client.set(self.key_prefix + sid, payload, ex=max(1, int(ttl)), nx=True)
+
+
+class FileSessionBackend:
+    """Sessions as files named after their id, expiring at their mtime"""
+
+    name = 'filesystem'
+
+    def __init__(self, directory, max_bytes, serializer=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.serializer = serializer or SessionSerializer()
+        # Estimate between sweeps, which recount it
+        self.total_bytes = 0
+
+    def _path(self, sid):
+        # Session ids are uuid4 strings; anything else never reaches the disk
+        try:
+            sid = str(uuid.UUID(sid))
+        except (TypeError, ValueError):
+            return None
+        digest = hashlib.sha256(sid.encode('ascii')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:4], sid)
+
+    def load(self, sid):
+        """(data, seconds left) of a session, or None"""
+        path = self._path(sid)
+        if path is None:
+            return None
+        try:
+            left = os.stat(path).st_mtime - time.time()
+            if left <= 0:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        return self.serializer.loads(payload), left
+
+    def write(self, sid, data, lifetime):
+        path = self._path(sid)
+        if path is None:
+            return
+        payload = self.serializer.dumps(data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
+        expires = time.time() + lifetime
+        os.utime(temp_path, (expires, expires))
+        os.replace(temp_path, path)
+        self.total_bytes += len(payload)
+
+    def touch(self, sid, lifetime):
+        path = self._path(sid)
+        if path is None:
+            return
+        expires = time.time() + lifetime
+        try:
+            os.utime(path, (expires, expires))
+        except FileNotFoundError:
+            pass
+
+    def delete(self, sid):
+        path = self._path(sid)
+        if path is None:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def over_limit(self):
+        return self.total_bytes > self.max_bytes
+
+    def sweep(self, adopt=None):
+        """
+        Remove expired sessions, then the ones closest to expiring while the
+        store is over max_bytes. With adopt, every live session is handed to
+        it and removed once adopted. Returns counts of what was done.
+        """
+        now = time.time()
+        result = {'expired': 0, 'evicted': 0, 'migrated': 0}
+        live = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if name.endswith('.tmp'):
+                        if now - stat.st_ctime > STALE_TEMP_AGE:
+                            os.remove(path)
+                        continue
+                    if stat.st_mtime <= now:
+                        os.remove(path)
+                        result['expired'] += 1
+                        continue
+                    if adopt is not None:
+                        with open(path, 'rb') as f:
+                            adopt(name, f.read(), stat.st_mtime - now)
+                        os.remove(path)
+                        result['migrated'] += 1
+                        continue
+                except FileNotFoundError:
+                    # Deleted by a request or another worker's sweeper
+                    continue
+                live.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in live)
+        if total > self.max_bytes:
+            for _, size, path in sorted(live):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                result['evicted'] += 1
+
+        self.total_bytes = total
+        result.update(files=len(live) - result['evicted'], bytes=total)
+        return result
+
+
+class StoredSession(ServerSideSession):
+    """Server-side session that remembers where it came from and how long it has left"""
+
+    source = None  # name of the backend it was loaded from
+    ttl = None  # seconds
+
+
+class LeanSessionInterface(SessionInterface):
+    """Sessions in Redis, falling back to files, without redundant writes"""
+
+    session_class = StoredSession
+
+    def __init__(self, redis=None, files=None, use_signer=False, permanent=True,
+                 retry_interval=30, sweep_interval=300, stats=None):
+        self.redis = redis
+        self.files = files
+        self.use_signer = use_signer
+        self.permanent = permanent
+        self.retry_interval = retry_interval
+        self.sweep_interval = sweep_interval
+        self.stats = stats if stats is not None else SessionStats()
+        self.has_same_site_capability = hasattr(self, 'get_cookie_samesite')
+        self.last_sweep = None
+        self._redis_down_until = 0.0
+        self._redis_down = False
+        self._sweeper = None
+        self._sweeper_pid = None
+        self._sweep_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+
+    # Backend selection
+
+    def mark_redis_down(self):
+        """Use the file store until the next retry"""
+        self._redis_down = True
+        self._redis_down_until = time.monotonic() + self.retry_interval
+
+    def _redis_available(self):
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, error):
+        if self.files is None:
+            raise error
+        print(f"WARNING: Session Redis error, using file sessions: {error}")
+        self.stats.count('redis_failures')
+        self.mark_redis_down()
+
+    def _redis_succeeded(self):
+        if self._redis_down:
+            self._redis_down = False
+            print("Session Redis is back, moving file sessions to it")
+            self._wake.set()
+
+    @property
+    def backend(self):
+        return self.redis if self._redis_available() else self.files
+
+    # Flask hooks
+
+    def _session_id(self, app, request):
+        sid = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+        if not sid or not self.use_signer:
+            return sid
+        signer = self._get_signer(app)
+        if signer is None:
+            return None
+        try:
+            return signer.unsign(sid).decode()
+        except Exception:
+            return None
+
+    def _load(self, sid):
+        if self._redis_available():
+            try:
+                loaded = self.redis.load(sid)
+                self._redis_succeeded()
+                if loaded is not None or self.files is None:
+                    return loaded, self.redis.name
+                # Possibly created during an outage; it moves to Redis when saved
+            except redis.exceptions.RedisError as e:
+                self._redis_failed(e)
+        if self.files is None:
+            return None, None
+        return self.files.load(sid), self.files.name
+
+    def open_session(self, app, request):
+        self._start_sweeper()
+        sid = self._session_id(app, request)
+        if not sid:
+            return self.session_class(sid=self._generate_sid(), permanent=self.permanent)
+
+        try:
+            loaded, source = self._load(sid)
+        except (pickle.UnpicklingError, ValueError, EOFError):
+            # Unreadable payload
+            loaded = None
+        self.stats.count('loads')
+        if loaded is None:
+            return self.session_class(sid=sid, permanent=self.permanent)
+        data, ttl = loaded
+        session = self.session_class(data, sid=sid)
+        session.source = source
+        session.ttl = ttl
+        return session
+
+    def _save_to(self, backend, session, lifetime):
+        """Store session in backend, returning whether the cookie needs refreshing"""
+        if not session.modified and session.source == backend.name and session.ttl is not None:
+            if session.ttl > lifetime / 2:
+                self.stats.count('skipped')
+                return False
+            backend.touch(session.sid, lifetime)
+            self.stats.count('refreshes')
+            return True
+
+        backend.write(session.sid, dict(session), lifetime)
+        self.stats.count('writes')
+        if session.source == FileSessionBackend.name and backend is not self.files:
+            self.files.delete(session.sid)
+            self.stats.count('migrated')
+        return True
+
+    def _delete(self, session):
+        backend = self.files if session.source == FileSessionBackend.name else self.backend
+        try:
+            backend.delete(session.sid)
+        except redis.exceptions.RedisError as e:
+            # The key expires on its own
+            self._redis_failed(e)
+        self.stats.count('deletes')
+
+    def save_session(self, app, session, response):
+        if not session:
+            if session.modified:
+                self._delete(session)
+                response.delete_cookie(app.config['SESSION_COOKIE_NAME'],
+                                       domain=self.get_cookie_domain(app),
+                                       path=self.get_cookie_path(app))
+            return
+
+        lifetime = int(app.permanent_session_lifetime.total_seconds())
+        try:
+            refresh_cookie = self._save_to(self.backend, session, lifetime)
+        except redis.exceptions.RedisError as e:
+            self._redis_failed(e)
+            refresh_cookie = self._save_to(self.files, session, lifetime)
+        if self.files is not None and self.files.over_limit:
+            self._wake.set()
+        if refresh_cookie:
+            self._set_cookie(app, session, response)
+
+    def _set_cookie(self, app, session, response):
+        if self.use_signer:
+            session_id = self._get_signer(app).sign(want_bytes(session.sid)).decode()
+        else:
+            session_id = session.sid
+        cookie_kwargs = {}
+        if self.has_same_site_capability:
+            cookie_kwargs['samesite'] = self.get_cookie_samesite(app)
+        response.set_cookie(app.config['SESSION_COOKIE_NAME'], session_id,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=self.get_cookie_domain(app),
+                            path=self.get_cookie_path(app),
+                            secure=self.get_cookie_secure(app),
+                            **cookie_kwargs)
+
+    # Sweeping the file store
+
+    def sweep(self):
+        """Expire, evict and (with Redis up) migrate file sessions"""
+        if self.files is None:
+            return None
+        with self._sweep_lock:
+            adopt = self.redis.adopt if self._redis_available() else None
+            try:
+                result = self.files.sweep(adopt)
+            except redis.exceptions.RedisError as e:
+                self._redis_failed(e)
+                result = self.files.sweep()
+            for name in ('expired', 'evicted', 'migrated'):
+                self.stats.count(name, result[name])
+            self.last_sweep = dict(result, at=time.time())
+            return result
+
+    def _start_sweeper(self):
+        if self.files is None or not self.sweep_interval:
+            return
+        # A thread inherited through fork (gunicorn --preload) is not running
+        if self._sweeper is None or self._sweeper_pid != os.getpid():
+            with self._start_lock:
+                if self._sweeper is None or self._sweeper_pid != os.getpid():
+                    self._sweeper = threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True)
+                    self._sweeper_pid = os.getpid()
+                    self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            self._wake.wait(self.sweep_interval)
+            self._wake.clear()
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"WARNING: Session sweep failed: {e}")
+
+
+class SessionStore:
+    """Builds the session interface from the app config"""
+
+    def __init__(self, app=None):
+        self._stats = SessionStats()
+        self.interface = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Call once SESSION_TYPE and SESSION_REDIS are settled"""
+        client = app.config.get('SESSION_REDIS')
+        redis_backend = None
+        if client is not None:
+            redis_backend = RedisSessionBackend(client, app.config.get('SESSION_KEY_PREFIX', 'session:'))
+        files = FileSessionBackend(app.config['SESSION_FILE_DIR'], app.config['SESSION_FILE_MAX_BYTES'])
+
+        self.interface = LeanSessionInterface(
+            redis=redis_backend,
+            files=files,
+            use_signer=app.config.get('SESSION_USE_SIGNER', False),
+            permanent=app.config.get('SESSION_PERMANENT', True),
+            retry_interval=app.config['SESSION_REDIS_RETRY_INTERVAL'],
+            sweep_interval=app.config['SESSION_FILE_SWEEP_INTERVAL'],
+            stats=self._stats,
+        )
+        if app.config.get('SESSION_TYPE') != 'redis':
+            # Redis did not answer at startup
+            self.interface.mark_redis_down()
+        app.session_interface = self.interface
+        app.extensions['session_store'] = self
+
+    def stats(self):
+        interface = self.interface
+        return dict(
+            self._stats.snapshot(),
+            backend=interface.backend.name,
+            serializer=interface.backend.serializer.name,
+            last_sweep=interface.last_sweep,
+        )
@@ -0,0 +1,97 @@
+# app/utils/similarity.py
+"""
+Item-item cosine similarity over a sparse user × item matrix.
+
+Interactions come in as parallel sequences of user and item indexes and
+weights; repeated (user, item) pairs are summed. Each item's column is
+scaled to unit length, so the dot product of two columns is their cosine
+similarity.
+
+With NumPy and SciPy the scores of block_size items at a time are one
+sparse matrix product, and each item's top k come from argpartition. The
+work grows with the co-occurring pairs, not with items squared. Without
+them, a pure Python loop does the same over dicts, which is fine for small
+catalogs.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - depends on the environment
+    np = sparse = None
+
+
+def engine():
+    """'numpy' when the sparse build is available, 'python' otherwise"""
+    return 'python' if sparse is None else 'numpy'
+
+
+def cooccurring(users, items, changed):
+    """Items sharing a user with any item in changed, changed included"""
+    if sparse is not None:
+        users = np.asarray(users, dtype=np.int64)
+        items = np.asarray(items, dtype=np.int64)
+        touched = np.unique(users[np.isin(items, list(changed))])
+        return set(np.unique(items[np.isin(users, touched)]).tolist()) | set(changed)
+    touched = {user for user, item in zip(users, items) if item in changed}
+    return {item for user, item in zip(users, items) if user in touched} | set(changed)
+
+
+def top_neighbors(users, items, weights, n_items, rows, k, block_size=1000):
+    """Yield (item, [(other, score), ...]) for each item in rows: its k most similar items, best first"""
+    if sparse is not None:
+        return _sparse_neighbors(users, items, weights, n_items, rows, k, block_size)
+    return _python_neighbors(users, items, weights, rows, k)
+
+
+def _sparse_neighbors(users, items, weights, n_items, rows, k, block_size):
+    users = np.asarray(users, dtype=np.int64)
+    items = np.asarray(items, dtype=np.int64)
+    n_users = int(users.max()) + 1 if len(users) else 0
+    # COO to CSR sums repeated pairs
+    matrix = sparse.csr_matrix(
+        (np.asarray(weights, dtype=np.float64), (users, items)), shape=(n_users, n_items)
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = (matrix @ sparse.diags(scale)).tocsr()
+    by_item = normalized.T.tocsr()
+
+    rows = np.asarray(rows, dtype=np.int64)
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        # One row of scores per item in the block, nonzero only where users overlap
+        scores = (by_item[block] @ normalized).tocsr()
+        for offset, item in enumerate(block):
+            lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+            others, values = scores.indices[lo:hi], scores.data[lo:hi]
+            keep = (others != item) & (values > 0)
+            others, values = others[keep], values[keep]
+            if len(values) > k:
+                top = np.argpartition(-values, k)[:k]
+                others, values = others[top], values[top]
+            order = np.lexsort((others, -values))
+            yield int(item), [(int(other), float(value)) for other, value in zip(others[order], values[order])]
+
+
+def _python_neighbors(users, items, weights, rows, k):
+    baskets = defaultdict(dict)  # user -> {item: weight}
+    for user, item, weight in zip(users, items, weights):
+        baskets[user][item] = baskets[user].get(item, 0.0) + weight
+    vectors = defaultdict(dict)  # item -> {user: weight}
+    for user, basket in baskets.items():
+        for item, weight in basket.items():
+            vectors[item][user] = weight
+    norms = {item: math.sqrt(sum(w * w for w in vector.values())) for item, vector in vectors.items()}
+
+    for item in rows:
+        dots = defaultdict(float)
+        for user, weight in vectors.get(item, {}).items():
+            for other, other_weight in baskets[user].items():
+                if other != item:
+                    dots[other] += weight * other_weight
+        scored = ((other, dot / (norms[item] * norms[other])) for other, dot in dots.items() if dot > 0)
+        yield item, heapq.nsmallest(k, scored, key=lambda pair: (-pair[1], pair[0]))
@@ -0,0 +1,295 @@
+# app/utils/text_search.py
+"""
+Catalog text normalization and an in-memory inverted index.
+
+Text is case folded and the Kazakh letters are folded onto their nearest
+Russian Cyrillic ones (ә → а, қ → к, ү/ұ → у, і → и, ...), so a title typed
+on a Russian keyboard, or with a letter mixed up, still matches. Book titles
+and author names are stored in this form in books.search_document, which
+PostgreSQL indexes; the same function folds queries.
+
+InvertedIndex answers the same queries from memory, for databases that have no
+full-text search of their own. PrefixIndex serves search-as-you-type
+suggestions.
+"""
+import bisect
+import copy
+import heapq
+import re
+import sys
+import unicodedata
+from collections import defaultdict
+
+SEARCH_BACKENDS = ('auto', 'database', 'memory')
+
+KAZAKH_FOLD = str.maketrans({
+    'ә': 'а',
+    'ғ': 'г',
+    'қ': 'к',
+    'ң': 'н',
+    'ө': 'о',
+    'ұ': 'у',
+    'ү': 'у',
+    'һ': 'х',
+    'і': 'и',
+    'ё': 'е',
+})
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Case folded text with Kazakh letters folded onto Russian ones"""
+    return unicodedata.normalize('NFKC', text or '').casefold().translate(KAZAKH_FOLD)
+
+
+def tokenize(text):
+    """Normalized words of text"""
+    return _WORD.findall(normalize(text))
+
+
+def search_document(title, author_name):
+    """The books.search_document value of a book: its title words, then its author's"""
+    return ' '.join(tokenize(title) + tokenize(author_name))
+
+
+def trigrams(token):
+    """Trigrams of a word, padded like pg_trgm"""
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class InvertedIndex:
+    """
+    Word → books postings over titles and author names.
+
+    Every query word must match a word of the book, exactly, as a prefix, or,
+    failing both, as a word sharing at least min_similarity of its trigrams.
+    Exact beats prefix beats fuzzy, title words beat author words, and titles
+    that start with the query come first.
+    """
+
+    EXACT, PREFIX, FUZZY = 3, 2, 1
+
+    def __init__(self, rows, max_prefix_words=1000, min_similarity=0.4):
+        """rows are (book_id, title, author_name)"""
+        self.max_prefix_words = max_prefix_words
+        self.min_similarity = min_similarity
+        self.ids = []
+        self.titles = []
+        self.documents = []
+        # word -> {document number: 1 for a title word, 0 for an author word}
+        postings = defaultdict(dict)
+        for number, (book_id, title, author_name) in enumerate(rows):
+            self.ids.append(book_id)
+            self.titles.append(title)
+            title_words = tokenize(title)
+            author_words = tokenize(author_name)
+            self.documents.append(' '.join(title_words + author_words))
+            for word in author_words:
+                postings[word].setdefault(number, 0)
+            for word in title_words:
+                postings[word][number] = 1
+        self.postings = dict(postings)
+        self.words = sorted(self.postings)
+        self._trigrams = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _fuzzy_words(self, token):
+        if self._trigrams is None:
+            index = defaultdict(list)
+            for word in self.words:
+                for gram in trigrams(word):
+                    index[gram].append(word)
+            self._trigrams = dict(index)
+
+        grams = trigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for word in self._trigrams.get(gram, ()):
+                shared[word] += 1
+        return [
+            word for word, count in shared.items()
+            if count / (len(grams) + len(trigrams(word)) - count) >= self.min_similarity
+        ]
+
+    def _match(self, token):
+        """{document number: score} of the books matching one query word"""
+        scores = {}
+
+        def add(word, score):
+            for number, in_title in self.postings[word].items():
+                score_here = score + in_title
+                if scores.get(number, 0) < score_here:
+                    scores[number] = score_here
+
+        start = bisect.bisect_left(self.words, token)
+        end = start
+        while end < len(self.words) and end - start < self.max_prefix_words and self.words[end].startswith(token):
+            add(self.words[end], self.EXACT if self.words[end] == token else self.PREFIX)
+            end += 1
+
+        if not scores:
+            for word in self._fuzzy_words(token):
+                add(word, self.FUZZY)
+        return scores
+
+    def search(self, query, limit=20):
+        """Ids of the best matching books for query"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        matches = sorted((self._match(token) for token in dict.fromkeys(tokens)), key=len)
+        totals = dict(matches[0])
+        for scores in matches[1:]:
+            totals = {number: total + scores[number] for number, total in totals.items() if number in scores}
+            if not totals:
+                return []
+
+        phrase = ' '.join(tokens)
+        ranked = sorted(
+            totals,
+            key=lambda number: (
+                -totals[number],
+                not self.documents[number].startswith(phrase),
+                self.titles[number],
+            ),
+        )
+        return [self.ids[number] for number in ranked[:limit]]
+
+
+class PrefixIndex:
+    """
+    Suggestions by prefix, most popular first.
+
+    Items are (kind, id, text, score). Every word of an item's text starts a
+    key in a sorted array, so 'жол' suggests 'Абай жолы'. The best k items of
+    every prefix up to short_prefix characters are precomputed, since those
+    match too many keys to rank per request; longer prefixes rank the keys in
+    their range.
+
+    updated() returns a new index with some items added or replaced, sharing
+    what it can with this one, so readers never see a half-applied change.
+    """
+
+    def __init__(self, items=(), k=10, short_prefix=3):
+        self.k = k
+        self.short_prefix = short_prefix
+        self.items = []
+        # (kind, id) -> number of the item's current version in items
+        self.live = {}
+        entries = []
+        for item in items:
+            number = self._append(item)
+            entries.extend((key, number) for key in self._keys(item[2]))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.refs = [number for _, number in entries]
+        self.top = {}
+        for number in sorted(self.live.values(), key=self._rank):
+            self._add_top(number, self.top, copied=None)
+        self._memory = None
+
+    @staticmethod
+    def _keys(text):
+        words = tokenize(text)
+        return list(dict.fromkeys(' '.join(words[i:]) for i in range(len(words))))
+
+    def _append(self, item):
+        self.items.append(item)
+        number = len(self.items) - 1
+        self.live[item[:2]] = number
+        return number
+
+    def _rank(self, number):
+        item = self.items[number]
+        return (-item[3], item[2])
+
+    def _prefixes(self, number):
+        return {key[:n] for key in self._keys(self.items[number][2]) for n in range(1, min(len(key), self.short_prefix) + 1)}
+
+    def _add_top(self, number, top, copied):
+        for prefix in self._prefixes(number):
+            best = top.get(prefix)
+            if best is None:
+                best = top[prefix] = []
+                if copied is not None:
+                    copied.add(prefix)
+            elif copied is not None and prefix not in copied:
+                best = top[prefix] = list(best)
+                copied.add(prefix)
+            elif len(best) >= self.k and copied is None:
+                continue
+            bisect.insort(best, number, key=self._rank)
+            del best[self.k:]
+
+    def _is_live(self, number):
+        return self.live.get(self.items[number][:2]) == number
+
+    def __len__(self):
+        return len(self.live)
+
+    @property
+    def dead(self):
+        """Replaced or removed items still taking up space"""
+        return len(self.items) - len(self.live)
+
+    def count(self, kind):
+        return sum(1 for item_kind, _ in self.live if item_kind == kind)
+
+    def updated(self, items=(), removed=()):
+        """A new index with items added (replacing those with the same kind and id) and removed dropped"""
+        new = copy.copy(self)
+        # Items only ever grow, so older indexes keep seeing their own
+        new.live = dict(self.live)
+        new.keys = list(self.keys)
+        new.refs = list(self.refs)
+        new.top = dict(self.top)
+        new._memory = None
+        copied = set()
+        for key in removed:
+            new.live.pop(key, None)
+        for item in items:
+            current = new.live.get(item[:2])
+            if current is not None and self.items[current] == item:
+                continue
+            number = new._append(item)
+            for key in self._keys(item[2]):
+                position = bisect.bisect_right(new.keys, key)
+                new.keys.insert(position, key)
+                new.refs.insert(position, number)
+            new._add_top(number, new.top, copied)
+        return new
+
+    def suggest(self, prefix, limit=10):
+        """(kind, id, text, score) of the best items with a word starting with prefix"""
+        words = tokenize(prefix)
+        if not words:
+            return []
+        # A trailing space means the last word is complete
+        prefix = ' '.join(words) + (' ' if prefix[-1].isspace() else '')
+
+        best = self.top.get(prefix)
+        if best is not None and limit <= self.k:
+            found = [number for number in best if self._is_live(number)]
+            # Dead entries only leave gaps when the list was full
+            if len(found) >= limit or len(best) < self.k:
+                return [self.items[number] for number in found[:limit]]
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+        numbers = {number for number in self.refs[start:end] if self._is_live(number)}
+        return [self.items[number] for number in heapq.nsmallest(limit, numbers, key=self._rank)]
+
+    def memory_bytes(self):
+        """Approximate size of the index in bytes"""
+        if self._memory is None:
+            size = sys.getsizeof(self.keys) + sum(map(sys.getsizeof, self.keys))
+            size += sys.getsizeof(self.refs) + sys.getsizeof(self.items) + sys.getsizeof(self.live)
+            size += sum(sys.getsizeof(item) + sys.getsizeof(item[2]) for item in self.items)
+            size += sys.getsizeof(self.top) + sum(map(sys.getsizeof, self.top.values()))
+            self._memory = size
+        return self._memory
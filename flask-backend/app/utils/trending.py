@@ -0,0 +1,187 @@
+# app/utils/trending.py
+"""
+Time-decayed book popularity counters in Redis.
+
+Scores use forward decay: an event at time t adds
+weight * 2 ** ((t - epoch) / TRENDING_HALF_LIFE) to its book, so ordering by
+score orders by the decayed sum at any moment without ever touching older
+entries. Adding a book to favorites or the cart adds TRENDING_WEIGHTS[kind];
+removing it takes off what that row added, at its created_at.
+
+Scores live in one sorted set per epoch. Each rollup (see
+app/services/trending_service.py) writes a fresh set from the favorites and
+cart tables with a new epoch, which keeps the numbers small and repairs
+counts missed while Redis was unreachable, and then points the workers to
+it. Workers read the current epoch again at most EPOCH_CHECK_INTERVAL
+seconds before recording, and the old set is kept for a while, for events
+already on their way to it.
+"""
+import threading
+import time
+import uuid
+from datetime import timezone
+import redis
+
+# Events recorded by workers that have not switched to a new set yet still count
+OLD_SET_GRACE = 300  # seconds
+# How long a worker records into the set it knows of; far below OLD_SET_GRACE,
+# so no worker writes to (and recreates) an expired set
+EPOCH_CHECK_INTERVAL = 5  # seconds
+# Lower scores are what float rounding leaves of added and removed rows
+MIN_SCORE = 1e-6
+
+
+class TrendingTracker:
+    """Popularity counters in the shared Redis"""
+
+    epoch_key = 'trending:epoch'
+    rollup_lock_key = 'trending:rollup'
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.half_life = app.config.get('TRENDING_HALF_LIFE', 3 * 24 * 3600)
+        self.weights = app.config.get('TRENDING_WEIGHTS', {'favorite': 1.0, 'cart': 2.0})
+        self.rollup_interval = app.config.get('TRENDING_ROLLUP_INTERVAL', 600)
+        self.retry_interval = app.config.get('TRENDING_REDIS_RETRY_INTERVAL', 30)
+
+        # Share the session Redis; without it trending runs on SQL rollups only
+        self.redis = app.config.get('SESSION_REDIS')
+        self._redis_down_until = 0.0
+        if app.config.get('SESSION_TYPE') != 'redis':
+            # Redis did not answer at startup; it is tried again like after any failure
+            self._redis_down_until = time.monotonic() + self.retry_interval
+        self.epoch = None
+        self._epoch_checked_at = float('-inf')
+        self._stats = {'events': 0, 'dropped': 0, 'redis_failures': 0, 'published': 0}
+        app.extensions['trending'] = self
+
+    # Redis access
+
+    def redis_available(self):
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, error):
+        print(f"WARNING: Trending Redis error, ranking from SQL rollups until it is back: {error}")
+        self._redis_down_until = time.monotonic() + self.retry_interval
+        with self._lock:
+            self._stats['redis_failures'] += 1
+
+    def _set_key(self, epoch):
+        return f'trending:scores:{epoch}'
+
+    # Scores
+
+    def weight(self, kind, epoch, at=None):
+        """Score of one kind event at time at (default now) relative to epoch"""
+        at = time.time() if at is None else at
+        return self.weights[kind] * 2 ** ((at - epoch) / self.half_life)
+
+    def record(self, kind, added=(), removed=()):
+        """Count books added to favorites or carts (kind) and removed (book_id, created_at) rows"""
+        if not added and not removed:
+            return
+        epoch = self._live_epoch()
+        if epoch is None or not self.redis_available():
+            # The next rollup counts them from the tables
+            with self._lock:
+                self._stats['dropped'] += len(added) + len(removed)
+            return
+
+        amount = self.weight(kind, epoch)
+        key = self._set_key(epoch)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for book_id in added:
+                pipe.zincrby(key, amount, str(book_id))
+            for book_id, created_at in removed:
+                # Only what the row added, decayed from its own time, comes off
+                pipe.zincrby(key, -self.weight(kind, epoch, _timestamp(created_at)), str(book_id))
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            self._redis_failed(e)
+            return
+        with self._lock:
+            self._stats['events'] += len(added) + len(removed)
+
+    def _live_epoch(self):
+        if time.monotonic() - self._epoch_checked_at >= EPOCH_CHECK_INTERVAL:
+            return self.current_epoch()
+        return self.epoch
+
+    def current_epoch(self):
+        """Epoch of the set the workers use, or None when there is none yet or Redis is down"""
+        if not self.redis_available():
+            return None
+        try:
+            epoch = self.redis.get(self.epoch_key)
+        except redis.exceptions.RedisError as e:
+            self._redis_failed(e)
+            return None
+        self.epoch = float(epoch) if epoch is not None else None
+        self._epoch_checked_at = time.monotonic()
+        return self.epoch
+
+    def top(self, count):
+        """[(book_id, score)] of the count highest scores in the current set, or None without one"""
+        epoch = self.current_epoch()
+        if epoch is None:
+            return None
+        try:
+            entries = self.redis.zrevrange(self._set_key(epoch), 0, count - 1, withscores=True)
+        except redis.exceptions.RedisError as e:
+            self._redis_failed(e)
+            return None
+        return [(uuid.UUID(member.decode() if isinstance(member, bytes) else member), score)
+                for member, score in entries if score > MIN_SCORE]
+
+    def claim_rollup(self, epoch):
+        """True if this worker should run the rollup: no other one has within the interval"""
+        if not self.redis_available():
+            return False
+        try:
+            return bool(self.redis.set(self.rollup_lock_key, epoch, nx=True, ex=max(1, int(self.rollup_interval))))
+        except redis.exceptions.RedisError as e:
+            self._redis_failed(e)
+            return False
+
+    def publish(self, epoch, scores, batch_size=1000):
+        """Write scores ({book_id: score} relative to epoch) as the new set and switch workers to it"""
+        key = self._set_key(epoch)
+        old = self.epoch
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(key)
+            items = [(str(book_id), score) for book_id, score in scores.items() if score > MIN_SCORE]
+            for start in range(0, len(items), batch_size):
+                pipe.zadd(key, dict(items[start:start + batch_size]))
+            pipe.set(self.epoch_key, epoch)
+            if old is not None and old != epoch:
+                pipe.expire(self._set_key(old), OLD_SET_GRACE)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            self._redis_failed(e)
+            return False
+        self.epoch = epoch
+        self._epoch_checked_at = time.monotonic()
+        with self._lock:
+            self._stats['published'] += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                epoch=self.epoch,
+                mode='redis' if self.redis_available() and self.epoch is not None else 'sql',
+            )
+
+
+def _timestamp(created_at):
+    """Unix time of a naive UTC created_at, or now without one"""
+    if created_at is None:
+        return time.time()
+    return created_at.replace(tzinfo=timezone.utc).timestamp()
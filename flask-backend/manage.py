@@ -4,6 +4,7 @@
 Database migration manager script for the Flask application
 """
 import os
+import click
 from dotenv import load_dotenv
 from app import create_app, db
 import app.models
@@ -16,12 +17,25 @@ app = create_app(os.getenv('FLASK_CONFIG', 'development'))
 
 
 @app.cli.command("seed")
-def seed():
-    """Seed the database with initial data"""
-    from app.routes.books import seed_books
-    with app.test_request_context():
-        result = seed_books()
-    print("Database seeded successfully!")
+@click.argument('path', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, help="Rows per insert batch (default: SEED_BATCH_SIZE)")
+def seed(path, batch_size):
+    """Seed the database with initial data, or with books from a CSV/JSONL file"""
+    from app.services.seed_service import read_records, seed_catalog, seed_default_catalog
+    try:
+        if path:
+            summary = seed_catalog(read_records(path), batch_size=batch_size)
+        else:
+            summary = seed_default_catalog()
+    except ValueError as e:
+        db.session.rollback()
+        print(f"Error seeding database: {e}")
+        return
+    print(f"Genres: {summary['genres']}, authors: {summary['authors']}, books: {summary['books']}")
+    print(f"Skipped existing books: {summary['skipped']}")
+    if summary['missing_files']:
+        print(f"Books with missing files (served as placeholders): {summary['missing_files']}")
+    print(f"Seeded in {summary['seconds']}s ({summary['rows_per_second']} rows/sec)")
 
 
 @app.cli.command("create-admin")
@@ -66,5 +80,97 @@ def recreate_db():
         print("Operation cancelled.")
 
 
+
+@app.cli.group()
+def assets():
+    """Manage the content-addressed asset store"""
+
+
+@assets.command("migrate")
+@click.option('--dry-run', is_flag=True, help="Only report what would be done")
+def migrate_assets(dry_run):
+    """Move flat uploads into the sharded asset store"""
+    from app.services.asset_service import migrate_uploads
+    summary = migrate_uploads(dry_run=dry_run)
+    print(f"Stored: {summary['stored']}")
+    print(f"Duplicates merged: {summary['duplicates']}")
+    print(f"Placeholder files removed: {summary['placeholders_removed']}")
+    print(f"Books updated: {summary['books_updated']}")
+
+
+@assets.command("gc")
+@click.option('--dry-run', is_flag=True, help="Only list the assets that would be removed")
+def collect_assets(dry_run):
+    """Delete stored files no book refers to"""
+    from app import asset_store
+    removed = asset_store.collect_garbage(dry_run=dry_run)
+    for name in removed:
+        print(name)
+    print(f"{'Would remove' if dry_run else 'Removed'} {len(removed)} unreferenced assets")
+
+
+@app.cli.group()
+def trending():
+    """Manage the trending books ranking"""
+
+
+@trending.command("rollup")
+def rollup_trending():
+    """Recompute trending scores from favorites and carts (and publish them to Redis)"""
+    from app.services.trending_service import run_rollup
+    published = run_rollup()
+    print("Published to Redis" if published else "Redis unavailable; computed for this process only")
+
+
+@app.cli.group()
+def recs():
+    """Manage "readers also liked" recommendations"""
+
+
+@recs.command("build")
+@click.option('--full', is_flag=True, help="Recompute every book, not only those affected since the last build")
+def build_recs(full):
+    """Compute similar books from favorites and carts"""
+    from app.services.recommendation_service import build_similarities
+    summary = build_similarities(full=full)
+    print(f"{'Full' if summary['full'] else 'Incremental'} build ({summary['engine']}): "
+          f"{summary['interactions']} interactions")
+    print(f"Books recomputed: {summary['books']}, neighbors stored: {summary['pairs']}")
+    print(f"Built in {summary['seconds']}s")
+
+
+@app.cli.group()
+def covers():
+    """Manage resized cover thumbnails"""
+
+
+@covers.command("generate")
+@click.option('--width', 'widths', type=int, multiple=True, help="Width to render, repeatable (default: COVER_WIDTHS)")
+@click.option('--format', 'formats', type=click.Choice(['webp', 'jpeg']), multiple=True, help="Format to render, repeatable (default: both)")
+def generate_covers(widths, formats):
+    """Pre-generate cover thumbnails for the whole catalog"""
+    from app.models import Book
+    from app.services.cover_service import COVER_FORMATS, Image, pregenerate_covers
+
+    if Image is None:
+        print("Pillow is not installed; originals are served instead of thumbnails.")
+        return
+
+    widths = widths or app.config['COVER_WIDTHS']
+    formats = formats or tuple(COVER_FORMATS)
+    names = [name for (name,) in db.session.execute(
+        db.select(Book.image).where(Book.image.isnot(None), Book.image != '').distinct()
+    )]
+
+    failed = 0
+    for done, (name, error) in enumerate(pregenerate_covers(names, widths, formats), start=1):
+        if error is not None:
+            failed += 1
+            print(f"{name}: {error}")
+        if done % 100 == 0 or done == len(names):
+            print(f"{done}/{len(names)} covers")
+    print(f"Processed {len(names)} covers ({failed} failed)")
+
+
 if __name__ == '__main__':
     app.run()
\ No newline at end of file
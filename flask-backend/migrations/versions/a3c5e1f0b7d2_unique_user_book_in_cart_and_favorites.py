@@ -0,0 +1,41 @@
+"""unique (user_id, book_id) in cart and favorites
+
+Removes duplicate rows, keeping the oldest, then adds the unique indexes the
+add-to-cart and add-to-favorite endpoints rely on. The tables are locked
+against writes while this runs, so no duplicate slips in between.
+
+Tables created by db.create_all() from the current models already have the
+indexes, so on those databases the migration finds nothing to change.
+
+Revision ID: a3c5e1f0b7d2
+Revises:
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e1f0b7d2'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLES = ('cart', 'favorites')
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+        op.execute(
+            f"DELETE FROM {table} t USING ("
+            f"SELECT id, row_number() OVER (PARTITION BY user_id, book_id ORDER BY created_at, id) AS n "
+            f"FROM {table}"
+            f") d WHERE t.id = d.id AND d.n > 1"
+        )
+        op.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_user_id_book_id ON {table} (user_id, book_id)")
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'uq_{table}_user_id_book_id', table_name=table)
@@ -0,0 +1,68 @@
+"""search_document on books, with full-text and trigram indexes
+
+Adds books.search_document (normalized title and author name, see
+app/utils/text_search.py), fills it in for existing books and indexes it for
+full-text search. When the pg_trgm extension is available it is enabled and a
+trigram index is added too, which lets searches match misspelled words; the
+app checks for that index and does without it otherwise.
+
+Revision ID: b81f4c2d9e6a
+Revises: a3c5e1f0b7d2
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.utils.text_search import search_document
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81f4c2d9e6a'
+down_revision = 'a3c5e1f0b7d2'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Tables created by db.create_all() from the current models have the column
+    if 'search_document' not in {column['name'] for column in sa.inspect(bind).get_columns('books')}:
+        op.add_column('books', sa.Column('search_document', sa.Text(), nullable=False, server_default=''))
+
+    rows = bind.execute(sa.text(
+        "SELECT books.id, books.title, authors.name FROM books JOIN authors ON authors.id = books.author_id "
+        "WHERE books.search_document = ''"
+    )).all()
+    update = sa.text("UPDATE books SET search_document = :document WHERE id = :id")
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(update, [
+            {'id': book_id, 'document': search_document(title, author_name)}
+            for book_id, title, author_name in rows[start:start + BATCH_SIZE]
+        ])
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books "
+        "USING gin (to_tsvector('simple'::regconfig, search_document))"
+    )
+
+    available = bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).first()
+    if available is None:
+        print("WARNING: pg_trgm is not available; search will not match misspelled words")
+        return
+    try:
+        with bind.begin_nested():
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except sa.exc.DBAPIError as e:
+        print(f"WARNING: Could not enable pg_trgm; search will not match misspelled words: {e}")
+        return
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_books_search_trgm ON books USING gin (search_document gin_trgm_ops)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_books_search_trgm")
+    op.drop_index('ix_books_search_vector', table_name='books')
+    op.drop_column('books', 'search_document')
@@ -0,0 +1,64 @@
+"""book_similarities and similarity_builds
+
+Tables for "readers also liked": each book's nearest neighbors, written by
+`flask recs build`, and a log of those builds, which the next one reads to
+tell what changed. Both start empty; run `flask recs build` to fill them.
+
+Revision ID: c4e7d9a2b5f1
+Revises: b81f4c2d9e6a
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7d9a2b5f1'
+down_revision = 'b81f4c2d9e6a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases made by db.create_all() from the current models have the tables
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'book_similarities' not in tables:
+        _create_book_similarities()
+    if 'similarity_builds' not in tables:
+        _create_similarity_builds()
+
+
+def _create_book_similarities():
+    op.create_table(
+        'book_similarities',
+        sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('rank', sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column('similar_book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['similar_book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id', 'rank'),
+    )
+    op.create_index('ix_book_similarities_similar_book_id', 'book_similarities', ['similar_book_id'])
+
+
+def _create_similarity_builds():
+    op.create_table(
+        'similarity_builds',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('watermark', sa.DateTime(), nullable=True),
+        sa.Column('interactions', sa.Integer(), nullable=False),
+        sa.Column('books', sa.Integer(), nullable=False),
+        sa.Column('pairs', sa.Integer(), nullable=False),
+        sa.Column('full', sa.Boolean(), nullable=False),
+        sa.Column('seconds', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('similarity_builds')
+    op.drop_table('book_similarities')
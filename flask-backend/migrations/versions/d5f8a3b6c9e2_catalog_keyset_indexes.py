@@ -0,0 +1,38 @@
+"""keyset pagination and filter indexes on books
+
+The indexes behind the paginated catalog (app/services/book_service.py):
+(created_at, id) for the keyset order, the same within a genre or an author,
+and year and price for range filters. Tables created by db.create_all() from
+the current models have them already, hence IF NOT EXISTS.
+
+Revision ID: d5f8a3b6c9e2
+Revises: c4e7d9a2b5f1
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f8a3b6c9e2'
+down_revision = 'c4e7d9a2b5f1'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_books_created_at_id': 'created_at, id',
+    'ix_books_genre_created_at_id': 'genre_id, created_at, id',
+    'ix_books_author_created_at_id': 'author_id, created_at, id',
+    'ix_books_year': 'year',
+    'ix_books_price': 'price',
+}
+
+
+def upgrade():
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON books ({columns})")
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='books')
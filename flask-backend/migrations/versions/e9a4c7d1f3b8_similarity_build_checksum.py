@@ -0,0 +1,32 @@
+"""checksum on similarity_builds
+
+A checksum of the favorite and cart rows each `flask recs build` read. The
+next build compares it with the rows up to the build's watermark to decide
+whether it can run incrementally. Builds made before have none, so the first
+build after this migration is a full one.
+
+Revision ID: e9a4c7d1f3b8
+Revises: d5f8a3b6c9e2
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a4c7d1f3b8'
+down_revision = 'd5f8a3b6c9e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tables created by db.create_all() from the current models have the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('similarity_builds')}
+    if 'checksum' not in columns:
+        op.add_column('similarity_builds', sa.Column('checksum', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('similarity_builds', 'checksum')
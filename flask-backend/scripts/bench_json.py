@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# scripts/bench_json.py
+"""
+Compare JSON serialization throughput of the stdlib and orjson paths of the
+API JSON provider on 10k Book.to_dict() payloads.
+
+Runs without a database: books are built in memory.
+"""
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from flask import Flask
+
+# Add parent directory to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Book, Author, Genre
+from app.utils.json_provider import JSONProvider, orjson
+
+PAYLOADS = 10000
+ROUNDS = 5
+
+
+def build_payloads(count):
+    """Serialize count in-memory books with their author and genre"""
+    now = datetime.utcnow()
+    genre = Genre(id=uuid.uuid4(), name='Тарихи роман', created_at=now, updated_at=now)
+    author = Author(id=uuid.uuid4(), name='Ілияс Есенберлин', created_at=now, updated_at=now)
+    payloads = []
+    for i in range(count):
+        book = Book(
+            id=uuid.uuid4(),
+            title=f'Көшпенділер {i}',
+            year=1976,
+            image='koshpendiler.jpg',
+            pdf='koshpendiler.pdf',
+            price=5000,
+            created_at=now,
+            updated_at=now
+        )
+        book.author = author
+        book.genre = genre
+        payloads.append(book.to_dict())
+    return payloads
+
+
+def bench(provider, payloads):
+    """Best wall time of serializing every payload individually and as one list"""
+    best_items = best_list = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for payload in payloads:
+            provider.dumps(payload)
+        best_items = min(best_items, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        provider.dumps(payloads)
+        best_list = min(best_list, time.perf_counter() - start)
+    return best_items, best_list
+
+
+def main():
+    app = Flask(__name__)
+    payloads = build_payloads(PAYLOADS)
+
+    providers = []
+    stdlib = JSONProvider(app)
+    stdlib.use_orjson = False
+    providers.append(('stdlib', stdlib))
+    if orjson is not None:
+        providers.append(('orjson', JSONProvider(app)))
+    else:
+        print("orjson is not installed, only the stdlib provider is measured")
+
+    print(f"Serializing {PAYLOADS} Book.to_dict() payloads, best of {ROUNDS} rounds\n")
+    print(f"{'provider':<10}{'per item':>16}{'one list':>16}")
+    for name, provider in providers:
+        items, whole = bench(provider, payloads)
+        print(f"{name:<10}{PAYLOADS / items:>10.0f} ops/s{PAYLOADS / whole:>10.0f} ops/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# scripts/bench_sessions.py
+"""
+Count the Redis round trips and bytes the session store costs per request,
+for Flask-Session's Redis interface and the lean one in app.utils.session_store.
+
+Replays one visit (login, browsing, profile, logout) against an in-memory
+Redis that counts commands, so no Redis server is needed.
+"""
+import os
+import sys
+import time
+from flask import Flask, session
+from flask_session.sessions import RedisSessionInterface
+
+# Add parent directory to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.session_store import LeanSessionInterface, RedisSessionBackend
+
+PAGE_VIEWS = 20
+
+
+class CountingRedis:
+    """Just enough of redis.Redis for both session interfaces"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.round_trips = 0
+        self.bytes_written = 0
+
+    def _call(self):
+        self.round_trips += 1
+
+    def get(self, key):
+        self._call()
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self._call()
+        self.data[key] = value
+        self.bytes_written += len(value)
+        self.expires[key] = time.time() + ex
+
+    def setex(self, name, time, value):
+        self.set(name, value, ex=time)
+
+    def expire(self, key, seconds):
+        self._call()
+        self.expires[key] = time.time() + seconds
+
+    def pttl(self, key):
+        self._call()
+        return int((self.expires[key] - time.time()) * 1000) if key in self.data else -2
+
+    def delete(self, *keys):
+        self._call()
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return CountingPipeline(self)
+
+
+class CountingPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((getattr(self.redis, name), args))
+            return self
+        return queue
+
+    def execute(self):
+        results = [command(*args) for command, args in self.commands]
+        self.redis.round_trips -= len(self.commands) - 1
+        return results
+
+
+def build_app(interface, lean):
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+    app.session_interface = interface
+
+    @app.post('/login')
+    def login():
+        # What Flask-Login's login_user stores
+        session['_user_id'] = '5b0c7b52-2b8e-4a67-9d0e-0c4e1a1f6c33'
+        session['_fresh'] = True
+        session['_id'] = 'f' * 128
+        session.permanent = True
+        if not lean:
+            session['user_id'] = session['_user_id']
+        return 'ok'
+
+    @app.get('/books')
+    def books():
+        return session.get('_user_id', '')
+
+    @app.post('/logout')
+    def logout():
+        for key in ('_user_id', '_fresh', '_id'):
+            session.pop(key, None)
+        if lean:
+            session.clear()
+        else:
+            for key in list(session.keys()):
+                session.pop(key, None)
+        return 'ok'
+
+    return app
+
+
+def replay(name, interface, redis, lean):
+    client = build_app(interface, lean).test_client()
+    steps = [('login', 'post', '/login', 1), ('browse', 'get', '/books', PAGE_VIEWS),
+             ('logout', 'post', '/logout', 1)]
+    print(name)
+    for label, method, path, repeat in steps:
+        before, written = redis.round_trips, redis.bytes_written
+        for _ in range(repeat):
+            getattr(client, method)(path)
+        print(f"  {label:<8}{(redis.round_trips - before) / repeat:>6.1f} round trips/request"
+              f"{(redis.bytes_written - written) / repeat:>8.0f} bytes written/request")
+
+
+def main():
+    print(f"One visit: login, {PAGE_VIEWS} page views, logout\n")
+    before = CountingRedis()
+    replay('Flask-Session RedisSessionInterface', RedisSessionInterface(before, 'session:', use_signer=True),
+           before, lean=False)
+    after = CountingRedis()
+    lean = LeanSessionInterface(redis=RedisSessionBackend(after), use_signer=True)
+    replay(f'LeanSessionInterface ({lean.redis.serializer.name})', lean, after, lean=True)
+    print(f"\nTotal round trips: {before.round_trips} before, {after.round_trips} after")
+
+
+if __name__ == '__main__':
+    main()
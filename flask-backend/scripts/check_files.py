@@ -6,12 +6,13 @@ import sys
 import json
 from flask import Flask
 from app.models import Book
-from app import create_app, db
+from app import create_app, db, asset_store
 
 def check_files():
     """
     Check that all book images and PDFs exist and are accessible.
-    Create placeholders for any missing files.
+    Missing files are reported; they are served as placeholders, so no
+    placeholder copies are written.
     """
     print("Checking file integrity...")
     
@@ -20,72 +21,35 @@ def check_files():
     with app.app_context():
         # Path to uploads directory
         uploads_dir = os.path.join(app.root_path, 'static', 'uploads')
-        os.makedirs(uploads_dir, exist_ok=True)
+        books_dir = os.path.join(uploads_dir, 'books')
         
-        # Create placeholder image if it doesn't exist
-        placeholder_img_path = os.path.join(uploads_dir, 'placeholder.png')
-        if not os.path.exists(placeholder_img_path):
-            print(f"Creating placeholder image at {placeholder_img_path}")
-            # Minimal valid PNG file (1x1 transparent pixel)
-            png_data = bytes.fromhex(
-                '89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c4'
-                '8900000006624b474400ff00ff00ffa0bda793000000097048597300000b1300'
-                '000b1301009a9c180000000774494d4507e5010101000082d7fb7c0000001d69'
-                '5448450000000000000000000000000000000000000000000000000171361302'
-                '00000009704859730000000049495420000000ae49444154081563600060000'
-                '0000100011a21569800000000049454e44ae426082'
+        def file_exists(directories, name):
+            return asset_store.exists(name) or any(
+                os.path.exists(os.path.join(directory, name)) for directory in directories
             )
-            with open(placeholder_img_path, 'wb') as f:
-                f.write(png_data)
-        
-        # Create empty PDF placeholder
-        placeholder_pdf_path = os.path.join(uploads_dir, 'placeholder.pdf')
-        if not os.path.exists(placeholder_pdf_path):
-            print(f"Creating placeholder PDF at {placeholder_pdf_path}")
-            with open(placeholder_pdf_path, 'w') as f:
-                f.write('%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n3 0 obj<</Type/Page/MediaBox[0 0 612 792]/Parent 2 0 R/Resources<<>>>>endobj\nxref\n0 4\n0000000000 65535 f\n0000000010 00000 n\n0000000053 00000 n\n0000000102 00000 n\ntrailer<</Size 4/Root 1 0 R>>\nstartxref\n178\n%%EOF\n')
         
         # Get all books from database
         books = Book.query.all()
         
         missing_files = {"images": [], "pdfs": []}
-        fixed_files = {"images": [], "pdfs": []}
         
         print(f"Checking {len(books)} books...")
         
         # Check each book's files
         for book in books:
-            # Check image
-            image_path = os.path.join(uploads_dir, book.image)
-            if not os.path.exists(image_path):
+            if not file_exists([uploads_dir], book.image):
                 missing_files["images"].append(book.image)
-                
-                # Create empty file as placeholder
-                with open(image_path, 'wb') as f:
-                    with open(placeholder_img_path, 'rb') as src:
-                        f.write(src.read())
-                
-                fixed_files["images"].append(book.image)
-                print(f"Created placeholder for missing image: {book.image}")
+                print(f"Missing image (served as placeholder): {book.image}")
             
-            # Check PDF
-            pdf_path = os.path.join(uploads_dir, book.pdf)
-            if not os.path.exists(pdf_path):
+            if not file_exists([books_dir, uploads_dir], book.pdf):
                 missing_files["pdfs"].append(book.pdf)
-                
-                # Create empty file as placeholder
-                with open(pdf_path, 'wb') as f:
-                    with open(placeholder_pdf_path, 'rb') as src:
-                        f.write(src.read())
-                
-                fixed_files["pdfs"].append(book.pdf)
-                print(f"Created placeholder for missing PDF: {book.pdf}")
+                print(f"Missing PDF (served as placeholder): {book.pdf}")
         
         # Summary
         print("\nFile check summary:")
         print(f"- Total books in database: {len(books)}")
-        print(f"- Missing images found and fixed: {len(fixed_files['images'])}")
-        print(f"- Missing PDFs found and fixed: {len(fixed_files['pdfs'])}")
+        print(f"- Missing images: {len(missing_files['images'])}")
+        print(f"- Missing PDFs: {len(missing_files['pdfs'])}")
         
         # Check for 'static' directory accessibility via URL
         print("\nVerifying static files accessibility:")
@@ -104,9 +68,7 @@ def check_files():
         report = {
             "total_books": len(books),
             "missing_images": missing_files["images"],
-            "missing_pdfs": missing_files["pdfs"],
-            "fixed_images": fixed_files["images"],
-            "fixed_pdfs": fixed_files["pdfs"]
+            "missing_pdfs": missing_files["pdfs"]
         }
         
         report_path = os.path.join(app.root_path, 'static', 'file_check_report.json')
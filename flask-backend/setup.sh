@@ -71,8 +71,6 @@ echo -e "\n${GREEN}Setting up database...${NC}"
 echo -e "${YELLOW}Note: Make sure PostgreSQL is running and the database is created.${NC}"
 echo -e "${YELLOW}To create database manually, run: createdb qazaq_kitap${NC}"
 
-flask db init
-flask db migrate -m "Initial migration"
 flask db upgrade
 
 # Final instructions